@@ -1,7 +1,7 @@
-import streamlit as st
+import contextvars
 import os
+import threading
 from dotenv import load_dotenv
-from supabase import create_client
 from assets import MODELS_USED
 
 load_dotenv()
@@ -13,17 +13,91 @@ def get_api_key(model):
       2) Returning the key from st.session_state if present;
          otherwise from os.environ.
     """
+    import streamlit as st  # only loaded when a key is looked up, cron workers may never need it
+
     env_var_name = list(MODELS_USED[model])[0]  # e.g., "GEMINI_API_KEY"
     return st.session_state.get(env_var_name) or os.getenv(env_var_name)
 
-def get_supabase_client():
-    """Returns a Supabase client if credentials exist, otherwise shows a guide."""
-    supabase_url = st.session_state.get('SUPABASE_URL') or os.getenv('SUPABASE_URL')
-    supabase_key = st.session_state.get('SUPABASE_ANON_KEY') or os.getenv('SUPABASE_ANON_KEY')
+# Supabase clients, one per (url, key). A client's PostgREST session is an httpx.Client,
+# so reusing it keeps connections alive instead of doing a TLS handshake per call.
+_supabase_clients = {}
+_supabase_lock = threading.Lock()
+_supabase_stats = {"created": 0, "hits": 0}
+
+# Credentials of the job running in this context (see use_supabase_credentials); None means the env.
+# Tasks and asyncio.to_thread workers inherit the value from the code that started them.
+_job_credentials = contextvars.ContextVar("supabase_credentials", default=None)
+
+
+def get_supabase_credentials():
+    """
+    Returns the Supabase (url, key) entered in the Streamlit sidebar if present, otherwise
+    the SUPABASE_URL / SUPABASE_ANON_KEY env vars. Like get_api_key(), st.session_state is
+    only readable from the Streamlit script thread, so resolve them there and hand them
+    to the job (see use_supabase_credentials).
+    """
+    import streamlit as st  # only loaded when credentials are looked up, cron workers may never need it
+
+    return (
+        st.session_state.get('SUPABASE_URL') or os.getenv('SUPABASE_URL'),
+        st.session_state.get('SUPABASE_ANON_KEY') or os.getenv('SUPABASE_ANON_KEY'),
+    )
+
 
+def use_supabase_credentials(credentials):
+    """
+    Use these (url, key) credentials for Supabase in the current context: the calling thread,
+    or the running task and every task and worker thread it starts. None goes back to the env.
+    """
+    _job_credentials.set(tuple(credentials) if credentials else None)
+
+
+def current_supabase_credentials():
+    """The (url, key) the current context uses (see use_supabase_credentials), or None if they are missing."""
+    supabase_url, supabase_key = _job_credentials.get() or (os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_ANON_KEY'))
     if not supabase_url or not supabase_key or "your-supabase-url-here" in supabase_url:
         return None
+    return supabase_url, supabase_key
+
+
+def get_supabase_client(credentials=None):
+    """
+    Returns the cached Supabase client for credentials (default: current_supabase_credentials()),
+    or None if there are none (the caller shows a guide). Clients are keyed by their credentials,
+    so sessions with different credentials never share one.
+    """
+    credentials = credentials or current_supabase_credentials()
+    if credentials is None:
+        return None
+    with _supabase_lock:
+        client = _supabase_clients.get(credentials)
+        if client is not None:
+            _supabase_stats["hits"] += 1
+            return client
+        from supabase import create_client
+
+        client = _supabase_clients[credentials] = create_client(*credentials)
+        _supabase_stats["created"] += 1
+        return client
+
 
-    return create_client(supabase_url, supabase_key)
+def supabase_pool_stats():
+    """Client cache counters plus the open connections of the cached clients' HTTP pools."""
+    with _supabase_lock:
+        stats = dict(_supabase_stats, clients=len(_supabase_clients))
+        clients = list(_supabase_clients.values())
+    stats["connections"] = None
+    try:
+        for client in clients:
+            # postgrest is created on first use; read the private attribute so stats don't create it
+            session = getattr(getattr(client, "_postgrest", None), "session", None)
+            if session is None:
+                continue
+            connections = session._transport._pool.connections
+            stats["connections"] = (stats["connections"] or 0) + len(connections)
+            stats["idle_connections"] = stats.get("idle_connections", 0) + sum(1 for c in connections if c.is_idle())
+    except AttributeError:
+        pass  # httpx/httpcore internals differ between versions
+    return stats
 
 
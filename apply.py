@@ -5,6 +5,9 @@ from crawl4ai.async_configs import BrowserConfig, CrawlerRunConfig
 import xml.etree.ElementTree as ET
 from urllib.parse import urljoin, urlparse
 from collections import deque
+from static_fetch import fetch_page, fetch_static
+from assets import STATIC_FAST_PATH
+from crawl_checkpoint import URL_DISCOVERY_JOB, save_checkpoint, load_checkpoint, clear_checkpoint
 
 class URLCrawler:
     def __init__(self, config: Dict = None):
@@ -16,6 +19,7 @@ class URLCrawler:
             "handle_lazy_load": False,
             "concurrent_requests": 10,  # Number of concurrent requests
             "batch_size": 50,          # Process URLs in batches
+            "static_fast_path": STATIC_FAST_PATH,  # Try a plain HTTP GET before rendering
             **(config or {}),
         }
         self.visited_urls: Set[str] = set()
@@ -29,17 +33,21 @@ class URLCrawler:
     async def _get_sitemap_urls(self, base_url: str) -> Set[str]:
         sitemap_urls = set()
         try:
-            async with AsyncWebCrawler() as crawler:
-                sitemap_url = urljoin(base_url, "/sitemap.xml")
-                result = await crawler.arun(sitemap_url)
-
-                if result.success:
-                    root = ET.fromstring(result.html)
-                    sitemap_urls.update(
-                        url.text for url in root.findall(
-                            ".//{http://www.sitemaps.org/schemas/sitemap/0.9}loc"
-                        )
+            sitemap_url = urljoin(base_url, "/sitemap.xml")
+            if self.config["static_fast_path"]:
+                # The sitemap is plain XML, no browser needed
+                result = await fetch_static(sitemap_url)
+            else:
+                async with AsyncWebCrawler() as crawler:
+                    result = await crawler.arun(sitemap_url)
+
+            if result.success:
+                root = ET.fromstring(result.html)
+                sitemap_urls.update(
+                    url.text for url in root.findall(
+                        ".//{http://www.sitemaps.org/schemas/sitemap/0.9}loc"
                     )
+                )
         except Exception as e:
             print(f"Error fetching sitemap: {e}")
         return sitemap_urls
@@ -74,7 +82,10 @@ class URLCrawler:
         """Process a single URL and return discovered URLs"""
         async with self.semaphore:  # Limit concurrent requests
             discovered_urls = set()
-            result = await crawler.arun(url)
+            if self.config["static_fast_path"]:
+                result = await fetch_page(url, crawler.arun)
+            else:
+                result = await crawler.arun(url)
             
             if result.success:
                 # Add internal links
@@ -107,21 +118,32 @@ class URLCrawler:
             results = await asyncio.gather(*tasks)
             return {url for urls in results for url in urls}  # Flatten results
 
-    async def get_urls(self, start_url: str, depth: int = 0, max_urls: int = 1) -> Set[str]:
+    async def get_urls(self, start_url: str, depth: int = 0, max_urls: int = 1, job_id: Optional[str] = None) -> Set[str]:
         """
         Main method to get a limited number of URLs starting from a given URL
         Returns a set of discovered URLs (up to max_urls)
+        With a job_id, progress is checkpointed after every batch (see crawl_checkpoint.py),
+        and a later call with the same job_id resumes from the last batch instead of starting over
         """
-        if depth > self.config["max_depth"] or start_url in self.visited_urls or len(self.visited_urls) >= max_urls:
-            return set()
-
-        self.visited_urls.add(start_url)
-        discovered_urls = {start_url}
-        urls_to_process = deque([start_url])
+        checkpoint = await asyncio.to_thread(load_checkpoint, job_id) if job_id else {}
+        state = checkpoint.get("state")
+        if state:
+            print(f"Resuming URL discovery {job_id}: {len(state['discovered'])} URLs found, {len(state['pending'])} left to process")
+            self.visited_urls.update(state["visited"])
+            discovered_urls = set(state["discovered"])
+            urls_to_process = deque(state["pending"])
+        else:
+            if depth > self.config["max_depth"] or start_url in self.visited_urls or len(self.visited_urls) >= max_urls:
+                return set()
+
+            self.visited_urls.add(start_url)
+            discovered_urls = {start_url}
+            urls_to_process = deque([start_url])
+        params = {"kind": URL_DISCOVERY_JOB, "depth": depth, "max_urls": max_urls, "config": self.config}
 
         async with AsyncWebCrawler() as crawler:
             # 1. Try sitemap if enabled
-            if self.config["crawl_sitemap"] and depth == 0:
+            if self.config["crawl_sitemap"] and depth == 0 and not state:
                 sitemap_urls = await self._get_sitemap_urls(start_url)
                 discovered_urls.update(sitemap_urls)
                 urls_to_process.extend(sitemap_urls)
@@ -149,6 +171,16 @@ class URLCrawler:
                         discovered_urls.add(url)
                         urls_to_process.append(url)
 
+                if job_id:
+                    await asyncio.to_thread(save_checkpoint, job_id, start_url, params, {
+                        "visited": sorted(self.visited_urls),
+                        "discovered": sorted(discovered_urls),
+                        "pending": list(urls_to_process),
+                    })
+
+            if job_id:
+                await asyncio.to_thread(clear_checkpoint, job_id)
+
             # Trim to max_urls before returning
             return set(list(discovered_urls)[:max_urls])
 
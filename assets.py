@@ -15,6 +15,45 @@ MODELS_USED = {
     DEEPSEEK_CHAT_MODEL_FULLNAME:{"DEEPSEEK_CHAT_API_KEY"}
 }
 
+# Concurrent LLM calls per provider (keyed by the API key env var in MODELS_USED),
+# used by acall_llm_model. Keep these under each account's rate limits.
+LLM_CONCURRENCY = {
+    "OPENAI_API_KEY": 8,
+    "GEMINI_API_KEY": 4,
+    "GROQ_API_KEY": 2,
+    "DEEPSEEK_CHAT_API_KEY": 4,
+}
+LLM_DEFAULT_CONCURRENCY = 4
+
+# Local cache of LLM responses (see llm_cache.py), keyed by model, prompt, schema and cleaned page
+LLM_CACHE_ENABLED = True
+LLM_CACHE_PATH = "llm_cache.db"
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+LLM_CACHE_MAX_ENTRIES = 5000
+
+# Pages are split into chunks of at most this many tokens (less if the model's context is
+# smaller) and extracted in parallel; LLM_CHUNK_RESERVED_TOKENS is left for prompt and output
+LLM_CHUNK_MAX_TOKENS = 24000
+LLM_CHUNK_RESERVED_TOKENS = 4000
+
+# Manual (CSS/regex) extraction: with more than one worker, stored pages are parsed in a
+# process pool of that many workers (None = one per CPU core), MANUAL_EXTRACT_CHUNKSIZE pages per task
+MANUAL_EXTRACT_WORKERS = 1
+MANUAL_EXTRACT_CHUNKSIZE = 8
+
+# Staged fetch -> clean -> extract -> persist pipeline (see pipeline.py): crawls waiting
+# between two stages (a full queue pauses the stage before it), and workers per stage.
+# Fetching runs MAX_CONCURRENT_URLS crawls at once.
+PIPELINE_QUEUE_SIZE = 4
+PIPELINE_CLEAN_WORKERS = 2
+PIPELINE_EXTRACT_WORKERS = 4
+
+# Pagination is first detected from the page's own links (see pagination_detector.py);
+# the LLM is only asked when no pattern is clear. Longest page sequence generated:
+PAGINATION_MAX_PAGES = 200
+# Pages fetched per URL when detected pagination is followed, counting the URL itself
+PAGINATION_FOLLOW_MAX_PAGES = 20
+
 # Timeout settings for web scraping
 TIMEOUT_SETTINGS = {
     "page_load": 30,
@@ -23,6 +62,71 @@ TIMEOUT_SETTINGS = {
 
 NUMBER_SCROLL=2
 
+# Shared browser pool (see browser_pool.py)
+BROWSER_POOL_SIZE = 2                  # browsers kept warm at once
+BROWSER_TABS_PER_BROWSER = 4           # concurrent pages per browser
+BROWSER_MAX_PAGES_PER_BROWSER = 200    # relaunch a browser after this many pages
+BROWSER_MAX_CONSECUTIVE_FAILURES = 3   # relaunch a browser after this many failures in a row
+CRAWL_CONCURRENCY = 8                  # pages in flight per crawl (see crawl_engine.py)
+MAX_CONCURRENT_URLS = 6                # submitted URLs crawled at once across the process
+
+# Stored crawls are reused for this long before a URL is crawled again
+RAW_CACHE_TTL_SECONDS = 24 * 60 * 60
+RAW_PAGE_READ_BATCH = 5          # stored pages fetched per query when reading a crawl back
+
+# Checkpoints of running crawls (see crawl_checkpoint.py): the visited set and frontier
+# are saved after this many new pages, or this many seconds, whichever comes first
+CRAWL_CHECKPOINT_PAGES = 25
+CRAWL_CHECKPOINT_SECONDS = 30.0
+
+# Compression for stored HTML (see raw_codec.py): "zstd" (needs zstandard), "gzip" or "none"
+RAW_DATA_CODEC = "gzip"
+RAW_DATA_COMPRESSION_LEVEL = 6
+
+# Where crawls, results and cron jobs are stored (see storage.py): "supabase" or "sqlite".
+# The STORAGE_BACKEND / SQLITE_DB_PATH env vars override these.
+STORAGE_BACKEND = "supabase"
+SQLITE_DB_PATH = "scraper.db"
+
+# Buffered storage writes (see write_buffer.py): rows per bulk write, and the longest
+# a row waits before it is written anyway
+WRITE_BUFFER_MAX_ROWS = 50
+WRITE_BUFFER_MAX_DELAY = 2.0
+
+# Conditional re-fetch of stored pages on scheduled runs (see page_validators.py)
+REVALIDATE_TIMEOUT = 15
+REVALIDATE_CONCURRENCY = 10
+
+# Plain HTTP fetch before falling back to a headless browser (see static_fetch.py)
+STATIC_FAST_PATH = True
+STATIC_FETCH_TIMEOUT = 20
+STATIC_MIN_TEXT_CHARS = 200      # less visible text than this means the page needs JS
+STATIC_PROBE_MIN_RATIO = 0.8     # static text must be this share of the rendered text
+SPA_MARKERS = [                  # empty client-side app mount points
+    '<div id="root"></div>',
+    '<div id="app"></div>',
+    '<div id="__next"></div>',
+    '<app-root></app-root>',
+]
+
+# Browser fetch profiles (see fetch_profiles.py). "lean" aborts assets we never use
+# for contact extraction and doesn't wait for images.
+FETCH_PROFILES = {
+    "full": {"wait_for_images": True, "scan_full_page": True, "block_assets": False},
+    "lean": {"wait_for_images": False, "scan_full_page": True, "block_assets": True},
+}
+DEFAULT_FETCH_PROFILE = "full"
+LEAN_BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+LEAN_BLOCKED_DOMAINS = [
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "googleadservices.com", "facebook.net", "hotjar.com", "clarity.ms", "segment.com", "segment.io",
+    "mixpanel.com", "hs-analytics.net", "nr-data.net", "scorecardresearch.com", "quantserve.com",
+    "criteo.com", "taboola.com", "outbrain.com", "ads.linkedin.com", "ads-twitter.com",
+    "analytics.tiktok.com",
+]
+# Typical transfer size per blocked request, used to estimate bytes saved
+LEAN_BYTES_ESTIMATE = {"image": 60_000, "media": 500_000, "font": 40_000, "tracker": 25_000}
+
 
 
 
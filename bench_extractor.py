@@ -0,0 +1,103 @@
+# bench_extractor.py
+#
+# Compares the single-pass contact extractor (contact_extractor.py) with the regex
+# extraction scraper.extract_field_values used before it, on large synthetic pages:
+#
+#   typical      contact-heavy page text, like a directory or listings page
+#   adversarial  long runs that made the old email pattern backtrack (quadratic time)
+#
+#   python bench_extractor.py                      # default sizes
+#   python bench_extractor.py --size-kb 4096 --repeat 5
+
+import argparse
+import random
+import re
+import time
+from typing import Callable, Dict, List
+
+from contact_extractor import extract_fields
+
+FIELDS = ["name", "email", "phone", "dob"]
+
+
+def legacy_extract(text: str, fields: List[str]) -> Dict[str, List[str]]:
+    """Regex branch of extract_field_values as it was: one findall per field, patterns rebuilt per call."""
+    extracted_data: Dict[str, List[str]] = {}
+    default_regex = {
+        'email': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+        'mobile number': r'(\+?\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}',
+        'phone': r'(\+?\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}',
+        'dob': r'\b\d{1,2}[\/-]\d{1,2}[\/-]\d{2,4}\b',
+        'date of birth': r'\b\d{1,2}[\/-]\d{1,2}[\/-]\d{2,4}\b',
+        'name': r'(?i)\b[A-Z][a-z]+(?: [A-Z][a-z]+)+\b'
+    }
+    for field in fields:
+        values = []
+        regex_key = next((key for key in default_regex.keys() if key.lower() == field.lower()), None)
+        if regex_key:
+            matches = re.findall(default_regex[regex_key], text, flags=re.IGNORECASE)
+            values = [match.strip() for match in matches if match.strip()]
+        extracted_data[field] = values
+    return extracted_data
+
+
+def typical_page(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    first = ["Alice", "Bruno", "Chen", "Dana", "Emeka", "Farah", "Goran", "Hana"]
+    last = ["Smith", "Okafor", "Lindqvist", "Moreau", "Tanaka", "Silva", "Novak", "Haddad"]
+    filler = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor".split()
+    parts, length = [], 0
+    while length < size:
+        name = f"{rng.choice(first)} {rng.choice(last)}"
+        part = (
+            f"{name} {' '.join(rng.choices(filler, k=12))} "
+            f"email {name.replace(' ', '.').lower()}@example{rng.randint(1, 99)}.com "
+            f"tel +1 ({rng.randint(200, 999)}) {rng.randint(200, 999)}-{rng.randint(1000, 9999)} "
+            f"born {rng.randint(1, 28)}/{rng.randint(1, 12)}/{rng.randint(1950, 2005)} "
+            f"ref {rng.randint(10 ** 5, 10 ** 9)} {' '.join(rng.choices(filler, k=20))} "
+        )
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)[:size]
+
+
+def adversarial_page(size: int) -> str:
+    # An '@' followed by a long dotless run, then long runs of digits and separators
+    half = size // 2
+    return "a@" + "a-" * (half // 2) + " " + "1 " * (half // 2)
+
+
+def timed(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(label: str, text: str, repeat: int) -> None:
+    legacy_s = timed(lambda: legacy_extract(text, FIELDS), repeat)
+    new_s = timed(lambda: extract_fields(text, FIELDS), repeat)
+    legacy_counts = {field: len(values) for field, values in legacy_extract(text, FIELDS).items()}
+    new_counts = {field: len(values) for field, values in extract_fields(text, FIELDS).items()}
+    print(f"{label}: {len(text) / 1024:.0f} KB")
+    print(f"  legacy  {legacy_s * 1000:10.1f} ms  {legacy_counts}")
+    print(f"  single  {new_s * 1000:10.1f} ms  {new_counts}")
+    print(f"  speedup {legacy_s / max(new_s, 1e-9):10.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Contact extractor benchmark")
+    parser.add_argument("--size-kb", type=int, default=2048, help="size of the typical page")
+    parser.add_argument("--adversarial-kb", type=int, default=16,
+                        help="size of the adversarial page (the legacy patterns are quadratic on it)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, best is reported")
+    args = parser.parse_args()
+
+    report("typical", typical_page(args.size_kb * 1024), args.repeat)
+    report("adversarial", adversarial_page(args.adversarial_kb * 1024), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# bench_imports.py
+#
+# Import-time report for the modules the UI and the cron worker load at start-up.
+# Each module is imported in a fresh interpreter with `python -X importtime`, and the
+# script fails if one goes over its budget or pulls in a dependency that should
+# only be loaded on first use.
+#
+#   python bench_imports.py            # report + budget check
+#   python bench_imports.py --top 25   # show more of the slowest imports
+
+import argparse
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Cumulative import time allowed per module, in milliseconds
+IMPORT_BUDGET_MS = {
+    "storage": 300,
+    "markdown": 600,
+    "scraper": 700,
+    "pagination": 700,
+    "cron": 800,
+    "pipeline": 800,
+}
+
+# Loaded on first use only; none of these may show up when the modules above are imported
+LAZY_MODULES = ("litellm", "crawl4ai", "playwright", "pandas", "apscheduler", "crontab", "bs4", "lxml", "supabase", "streamlit")
+
+RESET = "\033[0m"
+RED = "\033[31m"
+GREEN = "\033[32m"
+
+
+def measure(module: str) -> Tuple[float, List[Tuple[int, str]], str]:
+    """Returns (cumulative ms, [(cumulative us, package)], error output if the import failed)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    entries = []
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        try:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            entries.append((int(cumulative), name.rstrip()))
+        except ValueError:
+            continue
+    total = next((us for us, name in entries if name.strip() == module), 0) / 1000
+    error = proc.stderr.strip().splitlines()[-1] if proc.returncode else ""
+    return total, entries, error
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Import-time report and budget check")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list per module")
+    args = parser.parse_args()
+
+    failed = False
+    summary: Dict[str, float] = {}
+    for module, budget in IMPORT_BUDGET_MS.items():
+        total, entries, error = measure(module)
+        if error:
+            print(f"{RED}{module}: import failed: {error}{RESET}")
+            failed = True
+            continue
+        summary[module] = total
+
+        eager = sorted({name.strip().split(".")[0] for _, name in entries} & set(LAZY_MODULES))
+        over = total > budget
+        failed = failed or over or bool(eager)
+        colour = RED if over or eager else GREEN
+        print(f"{colour}{module}: {total:.0f} ms (budget {budget} ms){RESET}")
+        if eager:
+            print(f"{RED}  loaded eagerly: {', '.join(eager)}{RESET}")
+        for us, name in sorted(entries, reverse=True)[1:args.top + 1]:
+            print(f"  {us / 1000:8.1f} ms  {name.strip()}")
+
+    print("\n" + ", ".join(f"{module}={ms:.0f}ms" for module, ms in summary.items()))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
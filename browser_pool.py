@@ -0,0 +1,304 @@
+# browser_pool.py
+
+import asyncio
+import concurrent.futures
+import copy
+import threading
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from fetch_profiles import get_profile, install_lean_hooks
+from assets import (
+    DEFAULT_FETCH_PROFILE,
+    BROWSER_POOL_SIZE,
+    BROWSER_TABS_PER_BROWSER,
+    BROWSER_MAX_PAGES_PER_BROWSER,
+    BROWSER_MAX_CONSECUTIVE_FAILURES,
+)
+
+if TYPE_CHECKING:
+    # crawl4ai (and Playwright behind it) is imported when the first pool is created
+    from crawl4ai import AsyncWebCrawler
+    from crawl4ai.async_configs import BrowserConfig
+
+
+class _BrowserSlot:
+    """One pooled browser plus the tab sessions that can be leased from it."""
+
+    def __init__(self, index: int, tabs: int):
+        self.index = index
+        self.crawler: Optional["AsyncWebCrawler"] = None
+        self.lock = asyncio.Lock()
+        self.free_tabs: List[str] = [f"pool-{index}-tab-{t}" for t in range(tabs)]
+        self.in_use = 0
+        self.pages_served = 0
+        self.failures = 0
+        self.retiring = False
+        self.stale = False
+        self.launches = 0
+
+
+class PooledTab:
+    """
+    A leased browser tab. Every arun() goes through the same crawl4ai session,
+    so the underlying Playwright page is reused between navigations.
+    """
+
+    def __init__(self, pool: "BrowserPool", slot: _BrowserSlot, session_id: str):
+        self.pool = pool
+        self.slot = slot
+        self.session_id = session_id
+        self.failed = False
+
+    @property
+    def crawler(self) -> "AsyncWebCrawler":
+        return self.slot.crawler
+
+    async def arun(self, url: str, config=None):
+        # Copy the config so concurrent tabs sharing one config don't race on session_id
+        run_config = copy.copy(config) if config is not None else None
+        if run_config is not None:
+            run_config.session_id = self.session_id
+        self.slot.pages_served += 1
+        try:
+            result = await self.slot.crawler.arun(url, config=run_config)
+        except Exception:
+            self.failed = True
+            raise
+        if not result.success:
+            self.failed = True
+        return result
+
+
+class BrowserPool:
+    """
+    Keeps a fixed number of warm AsyncWebCrawler instances and leases their tabs out.
+
+    - size: maximum number of browsers launched at once
+    - tabs_per_browser: concurrent pages per browser (each one a reusable crawl4ai session)
+    - max_pages_per_browser: a browser is closed and relaunched after serving this many pages
+    - max_consecutive_failures: a browser is recycled after this many failed pages in a row
+    - profile: a FETCH_PROFILES name; "lean" pools block images, media, fonts and trackers
+      and record what they blocked per URL in page_stats
+    """
+
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        tabs_per_browser: int = BROWSER_TABS_PER_BROWSER,
+        max_pages_per_browser: int = BROWSER_MAX_PAGES_PER_BROWSER,
+        max_consecutive_failures: int = BROWSER_MAX_CONSECUTIVE_FAILURES,
+        browser_config: Optional["BrowserConfig"] = None,
+        profile: str = DEFAULT_FETCH_PROFILE,
+    ):
+        self.size = size
+        self.profile = profile
+        self.block_assets = bool(get_profile(profile)["block_assets"])
+        self.page_stats: Dict[str, Dict[str, object]] = {}
+        self.tabs_per_browser = tabs_per_browser
+        self.max_pages_per_browser = max_pages_per_browser
+        self.max_consecutive_failures = max_consecutive_failures
+        if browser_config is None:
+            from crawl4ai.async_configs import BrowserConfig
+
+            browser_config = BrowserConfig()
+        self.browser_config = browser_config
+        self._slots = [_BrowserSlot(i, tabs_per_browser) for i in range(size)]
+        self._cond = asyncio.Condition()
+        self._closed = False
+        self.recycled = 0
+
+    def _pick_slot(self) -> Optional[_BrowserSlot]:
+        # Drained browsers that hit their page budget get relaunched on next use
+        for slot in self._slots:
+            if slot.retiring and slot.in_use == 0:
+                slot.retiring = False
+                slot.stale = True
+                slot.pages_served = 0
+                slot.failures = 0
+
+        available = [s for s in self._slots if not s.retiring and s.free_tabs]
+        if not available:
+            return None
+        # Prefer a warm browser so we only launch new ones when the warm ones are busy
+        warm = [s for s in available if s.crawler is not None and not s.stale]
+        candidates = warm or available
+        return min(candidates, key=lambda s: s.in_use)
+
+    async def _is_healthy(self, slot: _BrowserSlot) -> bool:
+        crawler = slot.crawler
+        if crawler is None or not getattr(crawler, "ready", True):
+            return False
+        manager = getattr(crawler.crawler_strategy, "browser_manager", None)
+        browser = getattr(manager, "browser", None)
+        if browser is not None and hasattr(browser, "is_connected"):
+            return browser.is_connected()
+        return True
+
+    async def _close_crawler(self, slot: _BrowserSlot) -> None:
+        crawler, slot.crawler = slot.crawler, None
+        if crawler is None:
+            return
+        try:
+            await crawler.close()
+        except Exception as e:
+            print(f"Error closing pooled browser {slot.index}: {e}")
+
+    async def _ensure_browser(self, slot: _BrowserSlot) -> None:
+        async with slot.lock:
+            if slot.crawler is not None and (slot.stale or not await self._is_healthy(slot)):
+                print(f"Recycling pooled browser {slot.index}")
+                self.recycled += 1
+                await self._close_crawler(slot)
+            slot.stale = False
+            if slot.crawler is None:
+                from crawl4ai import AsyncWebCrawler
+
+                crawler = AsyncWebCrawler(config=self.browser_config)
+                if self.block_assets:
+                    install_lean_hooks(crawler, self.page_stats)
+                await crawler.start()
+                slot.crawler = crawler
+                slot.launches += 1
+                print(f"Launched pooled browser {slot.index} (launch #{slot.launches})")
+
+    async def acquire(self) -> PooledTab:
+        if self._closed:
+            raise RuntimeError("BrowserPool is closed")
+        async with self._cond:
+            slot = await self._cond.wait_for(self._pick_slot)
+            session_id = slot.free_tabs.pop()
+            slot.in_use += 1
+        tab = PooledTab(self, slot, session_id)
+        try:
+            await self._ensure_browser(slot)
+        except Exception:
+            tab.failed = True
+            await self.release(tab)
+            raise
+        return tab
+
+    async def release(self, tab: PooledTab) -> None:
+        slot = tab.slot
+        if tab.failed and slot.crawler is not None:
+            # A failed navigation can leave the page in a bad state, so drop that tab's page
+            kill_session = getattr(slot.crawler.crawler_strategy, "kill_session", None)
+            if kill_session is not None:
+                try:
+                    await kill_session(tab.session_id)
+                except Exception as e:
+                    print(f"Error killing session {tab.session_id}: {e}")
+        async with self._cond:
+            slot.in_use -= 1
+            slot.free_tabs.append(tab.session_id)
+            slot.failures = slot.failures + 1 if tab.failed else 0
+            if (
+                slot.pages_served >= self.max_pages_per_browser
+                or slot.failures >= self.max_consecutive_failures
+            ):
+                slot.retiring = True
+            self._cond.notify_all()
+
+    @asynccontextmanager
+    async def tab(self):
+        """async with pool.tab() as tab: result = await tab.arun(url, config=config)"""
+        leased = await self.acquire()
+        try:
+            yield leased
+        except Exception:
+            leased.failed = True
+            raise
+        finally:
+            await self.release(leased)
+
+    def pop_page_stats(self, url: str) -> Optional[Dict[str, object]]:
+        """Blocked-request summary for the last render of url (lean pools only)."""
+        return self.page_stats.pop(url, None)
+
+    async def close(self) -> None:
+        self._closed = True
+        for slot in self._slots:
+            async with slot.lock:
+                await self._close_crawler(slot)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "profile": self.profile,
+            "size": self.size,
+            "tabs_per_browser": self.tabs_per_browser,
+            "browsers_running": sum(1 for s in self._slots if s.crawler is not None),
+            "tabs_in_use": sum(s.in_use for s in self._slots),
+            "launches": sum(s.launches for s in self._slots),
+            "recycled": self.recycled,
+            "pages_served": [s.pages_served for s in self._slots],
+        }
+
+
+# =============================================================================
+# PROCESS-WIDE CRAWL LOOP
+# =============================================================================
+# Playwright objects are bound to the event loop that created them, so the shared
+# pool lives on one long-running loop in a daemon thread. Sync callers (Streamlit,
+# cron workers) submit coroutines to it with run_sync().
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+_pools: Dict[str, BrowserPool] = {}
+
+
+def get_crawl_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="crawl-loop", daemon=True)
+            thread.start()
+            _loop = loop
+        return _loop
+
+
+def submit(coro) -> "concurrent.futures.Future":
+    """Start a coroutine on the shared crawl loop and return its future without waiting."""
+    loop = get_crawl_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        raise RuntimeError("submit() / run_sync() called from the crawl loop; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop)
+
+
+def run_sync(coro, timeout: Optional[float] = None):
+    """Run a coroutine on the shared crawl loop and block until it finishes."""
+    return submit(coro).result(timeout)
+
+
+def get_browser_pool(profile: str = DEFAULT_FETCH_PROFILE) -> BrowserPool:
+    """
+    Returns the process-wide BrowserPool for a fetch profile. Must be called from a
+    coroutine running on the crawl loop (anything submitted through run_sync()).
+    """
+    if asyncio.get_running_loop() is not get_crawl_loop():
+        raise RuntimeError("get_browser_pool() must be used on the crawl loop (see run_sync)")
+    pool = _pools.get(profile)
+    if pool is None or pool._closed:
+        pool = _pools[profile] = BrowserPool(profile=profile)
+    return pool
+
+
+async def _close_browser_pool() -> None:
+    pools = list(_pools.values())
+    _pools.clear()
+    for pool in pools:
+        await pool.close()
+
+
+def close_browser_pool() -> None:
+    """Close every pooled browser (e.g. on scheduler shutdown)."""
+    if _loop is not None and not _loop.is_closed():
+        run_sync(_close_browser_pool())
+
+
+def browser_pool_stats() -> Dict[str, object]:
+    return {profile: pool.stats() for profile, pool in _pools.items()}
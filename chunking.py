@@ -0,0 +1,135 @@
+# chunking.py
+
+import json
+import re
+from typing import Dict, Iterable, List, Optional
+
+from assets import LLM_CHUNK_MAX_TOKENS, LLM_CHUNK_RESERVED_TOKENS
+from llm_calls import clean_html_from_string
+
+
+def chunk_token_budget(model: str) -> int:
+    """Tokens of page text per LLM call: LLM_CHUNK_MAX_TOKENS, capped by the model's context."""
+    from litellm import get_max_tokens, get_model_info
+
+    try:
+        limit = get_model_info(model).get("max_input_tokens") or get_max_tokens(model)
+    except Exception:
+        try:
+            limit = get_max_tokens(model)
+        except Exception:
+            limit = None
+    if not limit:
+        return LLM_CHUNK_MAX_TOKENS
+    return max(1000, min(LLM_CHUNK_MAX_TOKENS, limit - LLM_CHUNK_RESERVED_TOKENS))
+
+
+def _hard_split(text: str, max_chars: int) -> List[str]:
+    """Split one oversized paragraph at whitespace into pieces of at most max_chars."""
+    pieces = []
+    while len(text) > max_chars:
+        cut = text.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(text[:cut])
+        text = text[cut:].lstrip()
+    if text:
+        pieces.append(text)
+    return pieces
+
+
+def build_chunks(pages: Iterable[str], model: str, budget: Optional[int] = None) -> List[str]:
+    """
+    Clean each page of HTML and pack the text into chunks of at most `budget` tokens.
+    Chunks break between pages where possible, then between paragraphs, and only split
+    a paragraph that is larger than a whole chunk.
+
+    Each page is tokenized once with litellm's token_counter; paragraphs are sized
+    from that page's characters-per-token ratio.
+    """
+    from litellm import token_counter
+
+    budget = budget or chunk_token_budget(model)
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0.0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunks.append("\n".join(current))
+        current, current_tokens = [], 0.0
+
+    for html in pages:
+        if not html:
+            continue
+        text = clean_html_from_string(html, separator="\n")
+        if not text:
+            continue
+        page_tokens = token_counter(model=model, text=text)
+        if page_tokens <= budget:
+            pieces = [(text, page_tokens)]
+        else:
+            chars_per_token = len(text) / max(page_tokens, 1)
+            max_chars = int(budget * chars_per_token)
+            pieces = [
+                (piece, len(piece) / chars_per_token)
+                for paragraph in re.split(r"\n+", text)
+                for piece in _hard_split(paragraph, max_chars)
+            ]
+
+        for piece, tokens in pieces:
+            if current and current_tokens + tokens > budget:
+                flush()
+            current.append(piece)
+            current_tokens += tokens
+    flush()
+    return chunks
+
+
+def _listings_of(parsed) -> List[Dict[str, object]]:
+    if isinstance(parsed, str):
+        try:
+            parsed = json.loads(parsed)
+        except json.JSONDecodeError:
+            return []
+    if hasattr(parsed, "model_dump"):
+        parsed = parsed.model_dump()
+    if isinstance(parsed, dict):
+        listings = parsed.get("listings")
+        return [item for item in listings if isinstance(item, dict)] if isinstance(listings, list) else []
+    return []
+
+
+def _listing_key(listing: Dict[str, object]) -> str:
+    return json.dumps(
+        {field: " ".join(str(value).split()).lower() for field, value in listing.items()},
+        sort_keys=True,
+    )
+
+
+def merge_listings(parsed_chunks: List[object], container=None) -> Dict[str, object]:
+    """
+    Merge the per-chunk responses into one {"listings": [...]}, dropping empty rows and
+    rows that repeat (ignoring case and whitespace). If a DynamicListingsContainer model
+    is given, the result is validated against it; rows it rejects are dropped.
+    """
+    merged, seen = [], set()
+    for parsed in parsed_chunks:
+        for listing in _listings_of(parsed):
+            if not any(str(value).strip() for value in listing.values()):
+                continue
+            key = _listing_key(listing)
+            if key not in seen:
+                seen.add(key)
+                merged.append(listing)
+
+    if container is None:
+        return {"listings": merged}
+    valid = []
+    for listing in merged:
+        try:
+            valid.extend(container.model_validate({"listings": [listing]}).model_dump()["listings"])
+        except Exception as e:
+            print(f"Dropping listing that doesn't match the schema: {e}")
+    return {"listings": valid}
@@ -0,0 +1,65 @@
+# contact_extractor.py
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# One pattern per kind of value. Every repetition is either bounded or cannot overlap
+# with what follows it, so a failed match costs a constant amount of work per position
+# and a scan stays linear in the length of the page. The leading lookaheads reject most
+# positions on their first character.
+CONTACT_PATTERNS = {
+    # Local part must start a token, RFC length limits on the local part and labels
+    "email": r"(?<![\w.%+-])[A-Za-z0-9._%+-]{1,64}@(?:[A-Za-z0-9-]{1,63}\.){1,8}[A-Za-z]{2,24}\b",
+    # 10-digit number with an optional 1-3 digit country code, not inside a longer number
+    "phone": r"(?=[+(\d])(?<![\d+])(?:\+?\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}(?!\d)",
+    "dob": r"(?=\d)(?<!\d)\d{1,2}[/-]\d{1,2}[/-](?:\d{4}|\d{2})(?!\d)",
+    # Two or more capitalized words, not the local part of an email address
+    "name": r"\b[A-Z][a-z]+(?: [A-Z][a-z]+)+\b(?![\w.%+-]{0,64}@)",
+}
+
+# Field names (lower case) the extractor understands, and the kind each one maps to
+FIELD_KINDS = {
+    "email": "email",
+    "mobile number": "phone",
+    "phone": "phone",
+    "dob": "dob",
+    "date of birth": "dob",
+    "name": "name",
+}
+
+
+def field_kind(field: str) -> Optional[str]:
+    """The pattern kind for a field name, or None if there's no built-in pattern for it."""
+    return FIELD_KINDS.get(field.strip().lower())
+
+
+@lru_cache(maxsize=None)
+def _combined_pattern(kinds: Tuple[str, ...]) -> "re.Pattern[str]":
+    # Named alternatives in CONTACT_PATTERNS order: where two kinds could start at the
+    # same position (an email and a name), the earlier kind wins.
+    return re.compile("|".join(f"(?P<{kind}>{CONTACT_PATTERNS[kind]})" for kind in kinds))
+
+
+def extract_contacts(text: str, kinds: Iterable[str]) -> Dict[str, List[str]]:
+    """Values of every requested kind, found in one pass over the text, in page order."""
+    kinds = set(kinds)
+    wanted = tuple(kind for kind in CONTACT_PATTERNS if kind in kinds)
+    found: Dict[str, List[str]] = {kind: [] for kind in wanted}
+    if not wanted or not text:
+        return found
+    for match in _combined_pattern(wanted).finditer(text):
+        value = match.group().strip()
+        if value:
+            found[match.lastgroup].append(value)
+    return found
+
+
+def extract_fields(text: str, fields: Iterable[str]) -> Dict[str, List[str]]:
+    """
+    Regex values for each field that has a built-in pattern (see FIELD_KINDS); fields
+    without one are left out. Fields that map to the same kind share the same values.
+    """
+    kinds = {field: field_kind(field) for field in fields}
+    found = extract_contacts(text, {kind for kind in kinds.values() if kind})
+    return {field: list(found[kind]) for field, kind in kinds.items() if kind}
@@ -0,0 +1,51 @@
+# crawl_checkpoint.py
+
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from storage import get_storage
+from utils import is_fresh
+
+# params["kind"] of checkpoints written by markdown (page crawls) and apply.URLCrawler
+CRAWL_JOB = "crawl"
+URL_DISCOVERY_JOB = "url_discovery"
+
+
+def save_checkpoint(job_id: str, url: str, params: dict, state: dict) -> None:
+    """
+    Store the progress of a running crawl job so it can be resumed after a crash.
+    params are the job's crawl parameters (with a "kind"), state is whatever the job
+    needs to pick up where it stopped (visited URLs, frontier, pages stored so far).
+    """
+    get_storage().save_checkpoint({
+        "job_id": job_id,
+        "url": url,
+        "params": params,
+        "state": state,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    })
+
+
+def load_checkpoint(job_id: str, ttl_seconds: Optional[float] = None) -> dict:
+    """
+    The checkpoint of a job ('url', 'params', 'state', 'updated_at'), or {} if there is
+    none, or if ttl_seconds is given and the checkpoint is older than that.
+    """
+    checkpoint = get_storage().read_checkpoint(job_id)
+    if checkpoint and ttl_seconds is not None and not is_fresh(checkpoint.get("updated_at"), ttl_seconds):
+        return {}
+    return checkpoint
+
+
+def clear_checkpoint(job_id: str) -> None:
+    """Forget a job's checkpoint once the job has finished."""
+    get_storage().delete_checkpoint(job_id)
+
+
+def unfinished_jobs(kind: Optional[str] = CRAWL_JOB) -> List[dict]:
+    """
+    Jobs that saved a checkpoint and never finished, oldest first ('job_id', 'url',
+    'params', 'updated_at'). kind=None lists every kind of job.
+    """
+    rows = get_storage().list_checkpoints(("job_id", "url", "params", "updated_at"))
+    return [row for row in rows if kind is None or (row.get("params") or {}).get("kind") == kind]
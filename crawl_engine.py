@@ -0,0 +1,209 @@
+# crawl_engine.py
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from assets import CRAWL_CONCURRENCY, CRAWL_CHECKPOINT_PAGES, CRAWL_CHECKPOINT_SECONDS
+from browser_pool import BrowserPool
+from static_fetch import StaticResult, fetch_page
+
+
+class CrawlFrontier:
+    """
+    Breadth-first frontier shared by all crawl workers.
+
+    Budgets are checked and reserved without an await in between, so workers
+    running on the same event loop can never overshoot max_url.
+    """
+
+    def __init__(self, max_url: int, max_depth: int, visited: Optional[Set[str]] = None):
+        self.max_url = max_url
+        self.max_depth = max_depth
+        self.queue: "asyncio.Queue[Tuple[str, int, int]]" = asyncio.Queue()
+        self.visited: Set[str] = visited if visited is not None else set()
+        self.seen: Set[str] = set(self.visited)
+        self.fetched = 0
+        self.in_flight = 0
+        self.discovered = 0
+        # URLs that found the budget fully reserved; retried if an in-flight page fails
+        self.deferred: List[Tuple[str, int, int]] = []
+        # URL -> depth of every queued, deferred or in-flight URL, for checkpoints
+        self.waiting: Dict[str, int] = {}
+
+    def has_budget(self) -> bool:
+        return self.fetched + self.in_flight < self.max_url
+
+    def push(self, url: str, depth: int) -> bool:
+        if not url or url in self.seen or depth > self.max_depth:
+            return False
+        self.seen.add(url)
+        self.waiting[url] = depth
+        self.queue.put_nowait((url, depth, self.discovered))
+        self.discovered += 1
+        return True
+
+    def reserve(self) -> bool:
+        if not self.has_budget():
+            return False
+        self.in_flight += 1
+        return True
+
+    def defer(self, item: Tuple[str, int, int]) -> None:
+        if self.in_flight > 0:
+            self.deferred.append(item)
+        else:
+            self.waiting.pop(item[0], None)
+
+    def complete(self, url: str, success: bool) -> None:
+        self.in_flight -= 1
+        self.waiting.pop(url, None)
+        if success:
+            self.fetched += 1
+            self.visited.add(url)
+        elif self.deferred:
+            self.queue.put_nowait(self.deferred.pop(0))
+
+    def snapshot(self) -> Dict[str, list]:
+        """The visited URLs and the [url, depth] pairs still to crawl, as stored in a checkpoint."""
+        return {"visited": sorted(self.visited), "pending": [[url, depth] for url, depth in self.waiting.items()]}
+
+
+async def crawl_site(
+    start_url: str,
+    depth: int,
+    max_url: int,
+    config,
+    pool: BrowserPool,
+    concurrency: int = CRAWL_CONCURRENCY,
+    visited_urls: Optional[Set[str]] = None,
+    force_render: bool = False,
+    on_page: Optional[Callable[[Dict[str, object]], Awaitable[None]]] = None,
+    pending: Optional[List[Tuple[str, int]]] = None,
+    on_checkpoint: Optional[Callable[[Dict[str, list]], Awaitable[None]]] = None,
+) -> List[Dict[str, object]]:
+    """
+    Crawl start_url and its internal links breadth-first with up to `concurrency`
+    pages in flight. Pages up to `depth` links away from start_url are fetched,
+    and at most `max_url` pages are fetched successfully.
+    Each page is tried with a plain HTTP GET first (static_fetch.fetch_page) unless
+    force_render is set, e.g. when JS has to click a button on every page.
+
+    Returns one {"url", "depth", "status", "html", "headers", "blocked", "static", "fetched_at"}
+    dict per fetched page, ordered by depth and then by discovery order. "blocked" is
+    the lean profile's summary of aborted requests, or None; "static" is True when the
+    page came from the plain HTTP GET rather than the browser.
+
+    If on_page is given it is awaited with each page record as soon as the page is
+    fetched, and the returned records leave out "html", so a crawl holds roughly one
+    page of HTML per worker in memory instead of the whole site.
+
+    To resume an interrupted crawl, pass the visited URLs and the (url, depth) pairs
+    still to crawl from its last checkpoint as visited_urls and pending; start_url is
+    then not queued again. If on_checkpoint is given it is awaited with
+    CrawlFrontier.snapshot() every CRAWL_CHECKPOINT_PAGES pages or CRAWL_CHECKPOINT_SECONDS,
+    at a moment when no on_page call is running, so every visited page has been handed
+    to on_page and every other URL is in the snapshot's pending list.
+    """
+    frontier = CrawlFrontier(max_url, depth, visited_urls)
+    # on_page calls in progress, and when the last checkpoint was taken
+    storing = 0
+    checkpoint = {"pages": 0, "at": time.monotonic(), "saving": False}
+    user_agent = getattr(config, "user_agent", None)
+
+    async def render(url: str):
+        async with pool.tab() as tab:
+            return await tab.arun(url, config=config)
+    pages: List[Tuple[int, int, Dict[str, object]]] = []
+
+    async def maybe_checkpoint():
+        checkpoint["pages"] += 1
+        due = (checkpoint["pages"] >= CRAWL_CHECKPOINT_PAGES
+               or time.monotonic() - checkpoint["at"] >= CRAWL_CHECKPOINT_SECONDS)
+        if not due or storing or checkpoint["saving"]:
+            return
+        checkpoint.update(pages=0, at=time.monotonic(), saving=True)
+        try:
+            await on_checkpoint(frontier.snapshot())
+        except Exception as e:
+            print(f"Error saving checkpoint for {start_url}: {e}")
+        finally:
+            checkpoint["saving"] = False
+
+    async def worker():
+        nonlocal storing
+        while True:
+            url, level, order = await frontier.queue.get()
+            try:
+                if not frontier.reserve():
+                    print(f"Skipping {url}: max_url={max_url} reached")
+                    frontier.defer((url, level, order))
+                    continue
+
+                success = False
+                result = None
+                print(f"Going to: {url}")
+                try:
+                    result = await fetch_page(url, render, force_render, user_agent)
+                    success = result.success
+                except Exception as e:
+                    print(f"Error fetching {url}: {e}")
+                finally:
+                    frontier.complete(url, success)
+                    # Popped whatever the outcome, so failed renders don't leave stats in the pool
+                    blocked = pool.pop_page_stats(url)
+
+                if not success:
+                    print(f"Failed to fetch {url}")
+                    continue
+
+                page = {
+                    "url": url,
+                    "depth": level,
+                    "status": getattr(result, "status_code", None),
+                    "html": result.html,
+                    "headers": dict(getattr(result, "response_headers", None) or {}),
+                    "blocked": blocked,
+                    # Fetched with a plain GET rather than rendered
+                    "static": isinstance(result, StaticResult),
+                    "fetched_at": datetime.now(timezone.utc).isoformat(),
+                }
+                if on_page is not None:
+                    storing += 1
+                    try:
+                        await on_page(page)
+                    except Exception as e:
+                        print(f"Error storing {url}: {e}")
+                    finally:
+                        storing -= 1
+                    page = {key: value for key, value in page.items() if key != "html"}
+                pages.append((level, order, page))
+                print(f"Fetched: {url} (Depth: {level}, URLs processed: {frontier.fetched}/{max_url})")
+                if blocked:
+                    print(f"Lean profile on {url}: blocked {blocked['blocked']}, ~{blocked['bytes_saved_est'] // 1024} KB saved")
+
+                if level < depth and frontier.has_budget():
+                    internal_links = [link["href"] for link in result.links.get("internal", []) if link["href"]]
+                    queued = sum(frontier.push(link, level + 1) for link in sorted(set(internal_links)))
+                    print(f"Found {len(internal_links)} internal links on {url}, queued {queued} at depth {level + 1}")
+                if on_checkpoint is not None:
+                    await maybe_checkpoint()
+            finally:
+                frontier.queue.task_done()
+
+    if pending is None:
+        frontier.push(start_url, 0)
+    else:
+        for url, level in pending:
+            frontier.push(url, level)
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+    try:
+        await frontier.queue.join()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    pages.sort(key=lambda item: (item[0], item[1]))
+    return [page for _, _, page in pages]
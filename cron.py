@@ -1,8 +1,8 @@
 # from crontab import CronTab
-from api_management import get_supabase_client
-from markdown import fetch_and_store_markdowns
+from storage import get_storage
+from markdown import refresh_markdowns
+from browser_pool import close_browser_pool
 from scraper import scrape_urls_manually,scrape_urls
-supabase = get_supabase_client()
 
 # cron = CronTab(user=True)
 
@@ -16,41 +16,49 @@ def createCron(urls, cronCommand, fields, selection_type="manual",css_selectors=
         "css_selector": css_selectors
     }
     
-    # Get Supabase client
-    supabase = get_supabase_client()
-    
-
     # Insert data into the "cron" table
-    response = supabase.table("cron").insert(data).execute()
-    print(response)
+    rows = get_storage().create_cron(data)
     # Handle the response
-    if response:
-        print("Cron entry created successfully:", response.data)
+    if rows:
+        print("Cron entry created successfully:", rows)
     else:
-        print("Error:", response.error)
+        print("Error: cron entry was not created")
 
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
 import time
 import threading
 
 
+# Last extraction per cron id in this process ({unique_name: parsed_data} for ai jobs).
+# Results stay current unless a page changed, so unchanged re-runs skip extraction.
+_last_results = {}
+
+
 # Function to run the task (you can replace this with your actual task logic)
 def run_task(command,cron):
     print("cron",cron)
     print(f"Executing task: {command}")
-    # Replace this with the actual logic you need to execute for the cron job
-    unique_names= fetch_and_store_markdowns(cron['urls'],cron['depth_value'],cron['max_url'],cron['next_button_selector'])
-    print("unique_names",unique_names)
+    # Stale pages are revalidated with conditional GETs and only re-rendered if they changed
+    unique_names, changed = refresh_markdowns(cron['urls'],cron['depth_value'],cron['max_url'],cron['next_button_selector'])
+    print("unique_names",unique_names,"changed",changed)
+    if not changed and cron['id'] in _last_results:
+        print(f"No page changed for cron {cron['id']}, skipping extraction")
+        return
+
     if cron['selection_type']=='ai':
-        print("unique_names",unique_names)
-        in_tokens_s, out_tokens_s, cost_s, parsed_data = scrape_urls(unique_names,cron['fields'],cron['selection_type'])
+        # Only send changed pages (or ones not extracted yet) to the LLM
+        previous = _last_results.get(cron['id'], {})
+        to_extract = [uniq for uniq in unique_names if uniq in changed or uniq not in previous]
+        in_tokens_s, out_tokens_s, cost_s, fresh_data = scrape_urls(to_extract,cron['fields'],cron['selection_type'])
+        results = {uniq: previous[uniq] for uniq in unique_names if uniq in previous and uniq not in changed}
+        results.update({item["unique_name"]: item["parsed_data"] for item in fresh_data})
+        parsed_data = [{"unique_name": uniq, "parsed_data": results[uniq]} for uniq in unique_names if uniq in results]
         print(parsed_data)
         data= {
             "data":parsed_data
         }
-        supabase.table("cron").update(data).eq("id",cron['id']).execute()
-        print("Saved",unique_name)
+        get_storage().update_cron(cron['id'],data)
+        _last_results[cron['id']] = results
+        print("Saved",cron['id'])
 
     else:
         all_data= scrape_urls_manually(unique_names,cron['fields'],cron['selection_type'])
@@ -59,7 +67,8 @@ def run_task(command,cron):
         data= {
             "data":all_data
         }
-        supabase.table("cron").update(data).eq("id",cron['id']).execute()
+        get_storage().update_cron(cron['id'],data)
+        _last_results[cron['id']] = {}
         print("Updated ")
 
     # fetch_and_store_markdowns(cron['urls'],fields,css_selector
@@ -67,13 +76,11 @@ def run_task(command,cron):
 
 
 def fetch_and_schedule_crons(scheduler):
-    # Get Supabase client
-    supabase = get_supabase_client()
+    from apscheduler.triggers.cron import CronTrigger
+
     # Fetch all active cron jobs from the database
-    response = supabase.table("cron").select("id", "cronCommand","depth_value","urls","fields","css_selector","selection_type","selection_type","next_button_selector","max_url").execute()
-    print("Response",response)
-    cron_jobs = response.data
-    print("Response Data",response.data)
+    cron_jobs = get_storage().list_crons(("id", "cronCommand","depth_value","urls","fields","css_selector","selection_type","next_button_selector","max_url"))
+    print("Response Data",cron_jobs)
     # Create a list of existing job IDs from the scheduler
     existing_jobs = {job.id for job in scheduler.get_jobs()}
 
@@ -96,6 +103,10 @@ def fetch_and_schedule_crons(scheduler):
 
 
 def run_crons():
+    # apscheduler is only needed by the process that runs the jobs, not by the UI importing this module
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from apscheduler.triggers.cron import CronTrigger
+
     # Create a scheduler instance
     scheduler = BackgroundScheduler()
 
@@ -114,14 +125,13 @@ def run_crons():
             time.sleep(1)  # Sleep to keep the scheduler running
     except (KeyboardInterrupt, SystemExit):
         scheduler.shutdown()  # Clean up and shut down the scheduler when done
+        close_browser_pool()  # Close the browsers shared by every cron job
 
 
 def get_cron_data():
-    supabase = get_supabase_client()
     # Fetch all active cron jobs from the database
-    response = supabase.table("cron").select("id", "cronCommand","depth_value","urls","fields","css_selector","selection_type","selection_type","next_button_selector","max_url","data").execute()
-    print("Response",response)
-    cron_jobs = response.data
+    cron_jobs = get_storage().list_crons(("id", "cronCommand","depth_value","urls","fields","css_selector","selection_type","next_button_selector","max_url","data"))
+    print("Response",cron_jobs)
     if(len(cron_jobs)!=0):
         return cron_jobs
     else:
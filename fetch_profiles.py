@@ -0,0 +1,83 @@
+# fetch_profiles.py
+
+from collections import Counter
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from assets import (
+    FETCH_PROFILES,
+    LEAN_BLOCKED_RESOURCE_TYPES,
+    LEAN_BLOCKED_DOMAINS,
+    LEAN_BYTES_ESTIMATE,
+)
+
+
+def get_profile(name: Optional[str]) -> Dict[str, object]:
+    if name not in FETCH_PROFILES:
+        raise ValueError(f"Unknown fetch profile {name!r}, expected one of {list(FETCH_PROFILES)}")
+    return FETCH_PROFILES[name]
+
+
+def _blocked_kind(resource_type: str, url: str) -> Optional[str]:
+    if resource_type in LEAN_BLOCKED_RESOURCE_TYPES:
+        return resource_type
+    host = (urlparse(url).hostname or "").lower()
+    if any(host == domain or host.endswith("." + domain) for domain in LEAN_BLOCKED_DOMAINS):
+        return "tracker"
+    return None
+
+
+def summarize_blocked(counts: Counter) -> Dict[str, object]:
+    """Blocked request counts per kind plus an estimate of the bytes not downloaded."""
+    return {
+        "blocked": dict(counts),
+        "bytes_saved_est": sum(LEAN_BYTES_ESTIMATE.get(kind, 0) * n for kind, n in counts.items()),
+    }
+
+
+def install_lean_hooks(crawler, page_stats: Dict[str, Dict[str, object]]) -> None:
+    """
+    Register crawl4ai hooks that abort image/media/font requests and known
+    analytics hosts on every page the crawler opens. After each page, a
+    summarize_blocked() dict is stored in page_stats under the URL passed to arun().
+    """
+    counters: Dict[int, Counter] = {}
+    current_url: Dict[int, str] = {}
+
+    def _page(args, kwargs):
+        return kwargs.get("page") or (args[0] if args else None)
+
+    async def on_page_context_created(*args, **kwargs):
+        page = _page(args, kwargs)
+        if page is None:
+            return page
+
+        async def block(route, request=None):
+            request = request or route.request
+            kind = _blocked_kind(request.resource_type, request.url)
+            if kind:
+                counters.setdefault(id(page), Counter())[kind] += 1
+                await route.abort()
+            else:
+                await route.continue_()
+
+        await page.route("**/*", block)
+        return page
+
+    async def before_goto(*args, **kwargs):
+        page = _page(args, kwargs)
+        if page is not None:
+            counters[id(page)] = Counter()
+            current_url[id(page)] = kwargs.get("url", "")
+        return page
+
+    async def before_return_html(*args, **kwargs):
+        page = _page(args, kwargs)
+        if page is not None and current_url.get(id(page)):
+            page_stats[current_url.pop(id(page))] = summarize_blocked(counters.pop(id(page), Counter()))
+        return page
+
+    strategy = crawler.crawler_strategy
+    strategy.set_hook("on_page_context_created", on_page_context_created)
+    strategy.set_hook("before_goto", before_goto)
+    strategy.set_hook("before_return_html", before_return_html)
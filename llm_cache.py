@@ -0,0 +1,140 @@
+# llm_cache.py
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from assets import LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES
+
+
+def _schema_of(response_format) -> object:
+    """A JSON-serializable description of a response_format (Pydantic model class or dict)."""
+    if hasattr(response_format, "model_json_schema"):
+        return response_format.model_json_schema()
+    return response_format
+
+
+def llm_cache_key(params: Dict[str, object]) -> str:
+    """
+    Hash of everything that decides a completion: model, messages (system message and
+    cleaned page text), response schema and max_tokens.
+    """
+    payload = {
+        "model": params["model"],
+        "messages": params["messages"],
+        "schema": _schema_of(params.get("response_format")),
+        "max_tokens": params.get("max_tokens"),
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8", errors="ignore")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class LLMCache:
+    """
+    Completions stored in a local SQLite file. Entries expire after ttl_seconds, and the
+    least recently used ones are evicted once there are more than max_entries.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT,
+                    token_counts TEXT,
+                    cost REAL,
+                    created_at REAL,
+                    last_used REAL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used)")
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[object, Dict[str, int]]]:
+        """Returns (parsed_response, token_counts) of the original call, or None."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, token_counts, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[2] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0]), json.loads(row[1])
+
+    def put(self, key: str, model: str, parsed_response, token_counts: Dict[str, int], cost: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, response, token_counts, cost, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, json.dumps(parsed_response), json.dumps(token_counts), cost, now, now),
+            )
+            expired = self._conn.execute(
+                "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+            ).rowcount
+            overflow = self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+            self._conn.commit()
+            self.evictions += expired + overflow
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            saved = self._conn.execute("SELECT COALESCE(SUM(cost), 0) FROM llm_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "cost_of_cached_entries": saved,
+        }
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """The process-wide LLMCache, or None when LLM_CACHE_ENABLED is off."""
+    global _cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
+
+
+def llm_cache_stats() -> Dict[str, object]:
+    cache = get_llm_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
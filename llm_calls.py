@@ -1,42 +1,30 @@
 # llm_calls.py
-import litellm
+import asyncio
+import hashlib
 import json
-from litellm import (completion,token_counter,completion_cost,get_max_tokens,)
-from assets import USER_MESSAGE, MODELS_USED
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+from assets import USER_MESSAGE, MODELS_USED, LLM_CONCURRENCY, LLM_DEFAULT_CONCURRENCY
 from api_management import get_api_key
+from llm_cache import get_llm_cache, llm_cache_key
+from parsed_page import ParsedPage
 import os
-from bs4 import BeautifulSoup
 
-def clean_html_from_string(html_content):
-    print("Starting HTML cleanup...")
-
-    # Parse the HTML content with BeautifulSoup
-    soup = BeautifulSoup(html_content, 'lxml')
-
-
-
-    for tag in soup(['script', 'style', 'footer', 'header', 'nav', 'aside', 'advertisement', 'ads']):
-    
-        tag.decompose()  # This removes the tag and its content
-
-    # Step 2: Extract specific content (e.g., the main article or product info)
-    print("Searching for the main content...")
-    main_content = soup.find('div', class_='main-content')  # Adjust the class as per your needs
+# litellm takes seconds to import and BeautifulSoup/lxml pull in a parser stack,
+# so both are imported on first use rather than when the UI or a cron worker starts.
 
-    if main_content:
-       
-        # Extract only the text or specific elements you're interested in (e.g., text content)
-        text_content = main_content.get_text(separator=' ', strip=True)
-        # Print the first 100 characters of the extracted text for preview
-    else:
-        
-        # If the main content isn't found, fallback to the entire body
-        text_content = soup.body.get_text(separator=' ', strip=True)
-       
-
-    return text_content
+def clean_html_from_string(html_content, separator=' '):
+    """
+    Text of the page's main content (div.main-content, else the body) without headers,
+    footers, navigation, ads, scripts or styles. Accepts HTML or an already parsed ParsedPage.
+    """
+    print("Starting HTML cleanup...")
+    page = html_content if isinstance(html_content, ParsedPage) else ParsedPage(html_content)
+    return page.cleaned_text(separator)
 
-def call_llm_model(data,response_format,model,system_message,extra_user_instruction="",max_tokens=None,use_model_max_tokens_if_none=False):
+def call_llm_model(data,response_format,model,system_message,extra_user_instruction="",max_tokens=None,use_model_max_tokens_if_none=False,use_cache=True,clean=True):
     """
     Calls an LLM via LiteLLM and returns:
       - parsed_response (str or dict, depending on your response_format),
@@ -55,6 +43,11 @@ def call_llm_model(data,response_format,model,system_message,extra_user_instruct
         max_tokens (int, optional): The maximum number of tokens to allow in the completion.
         use_model_max_tokens_if_none (bool, optional): If True and max_tokens is not provided,
             the function will automatically use the model's maximum context size.
+        use_cache (bool, optional): Answer from the local LLM cache (see llm_cache.py) when the
+            same model, prompt, schema and cleaned page were seen before. Hits cost nothing
+            and report zero tokens.
+        clean (bool, optional): Run data through clean_html_from_string first. Pass False
+            for text that is already cleaned, e.g. chunks from chunking.build_chunks.
 
     Returns:
         tuple: (parsed_response, token_counts, cost)
@@ -62,12 +55,54 @@ def call_llm_model(data,response_format,model,system_message,extra_user_instruct
             - token_counts: A dict with "input_tokens" and "output_tokens".
             - cost: The overall cost (in USD) for the API call.
     """
-    data= clean_html_from_string(data)
+    from litellm import completion
+
+    params, messages = _prepare_llm_call(data, response_format, model, system_message, extra_user_instruction, max_tokens, use_model_max_tokens_if_none, clean=clean)
+    key, cached = _cache_lookup(params, use_cache)
+    if cached is not None:
+        return cached
+
+    # Call the LLM using LiteLLM
+    started = time.perf_counter()
+    response = completion(**params)
+    network = time.perf_counter() - started
+
+    result = _finish_llm_call(response, model, messages, {"queue_s": 0.0, "network_s": network})
+    _cache_store(key, model, result)
+    return result
+
+
+def _cache_lookup(params, use_cache):
+    """Returns (cache key, cached result or None). The key is None when caching is off."""
+    cache = get_llm_cache() if use_cache else None
+    if cache is None:
+        return None, None
+    key = llm_cache_key(params)
+    hit = cache.get(key)
+    if hit is None:
+        return key, None
+    print(f"LLM cache hit for {params['model']}")
+    parsed_response, _ = hit
+    return key, (parsed_response, {"input_tokens": 0, "output_tokens": 0, "cached": True}, 0.0)
+
+
+def _cache_store(key, model, result):
+    if key is not None:
+        parsed_response, token_counts, cost = result
+        get_llm_cache().put(key, model, parsed_response, token_counts, cost)
+
+
+def _prepare_llm_call(data, response_format, model, system_message, extra_user_instruction="", max_tokens=None, use_model_max_tokens_if_none=False, api_key=None, clean=True):
+    """Clean the page, export the API key and build the LiteLLM parameters. Returns (params, messages)."""
+    from litellm import get_max_tokens
+
+    if clean:
+        data= clean_html_from_string(data)
     # 1) Retrieve the single API key name for this model from MODELS_USED
     env_var_name = list(MODELS_USED[model])[0]  # e.g., "GEMINI_API_KEY"
     # 2) Retrieve the actual key from session or OS
-    env_value = get_api_key(model)
-    print("env variable is:" + env_value)
+    env_value = api_key or get_api_key(model)
+    print("Using API key from " + env_var_name)
     # 3) Set it in os.environ so that litellm / underlying client sees it
     if env_value:
         os.environ[env_var_name] = env_value
@@ -92,28 +127,67 @@ def call_llm_model(data,response_format,model,system_message,extra_user_instruct
     }
     if max_tokens is not None:
         params["max_tokens"] = max_tokens
+    return params, messages
+
+
+# Local token counts, keyed by (model, content hash); only used when a provider reports no usage
+_token_counts: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+_token_counts_lock = threading.Lock()
+_TOKEN_COUNT_CACHE_SIZE = 2048
+
+
+def _count_tokens_cached(model, text, messages=None):
+    """token_counter() of text (or of messages, whose contents are text), cached by content hash."""
+    from litellm import token_counter
+
+    key = (model, hashlib.sha256(text.encode("utf-8", errors="ignore")).hexdigest())
+    with _token_counts_lock:
+        if key in _token_counts:
+            _token_counts.move_to_end(key)
+            return _token_counts[key]
+    count = token_counter(model=model, messages=messages) if messages else token_counter(model=model, text=text)
+    with _token_counts_lock:
+        _token_counts[key] = count
+        if len(_token_counts) > _TOKEN_COUNT_CACHE_SIZE:
+            _token_counts.popitem(last=False)
+    return count
+
+
+def _finish_llm_call(response, model, messages, timings=None):
+    """
+    Returns (parsed_response, token_counts, cost) for a LiteLLM response.
+    Token counts come from the provider's usage block; local tokenization is only the
+    fallback. token_counts["timings"] holds the queue, network and tokenization seconds.
+    """
+    from litellm import completion_cost
 
-    # Call the LLM using LiteLLM
-    response = completion(**params)
-    
     # Extract the parsed response
     parsed_response = response.choices[0].message.content
 
-    # Calculate token counts:
-    #   - input_tokens: from the user/system prompt
-    #   - output_tokens: from the returned content
-    input_tokens = token_counter(model=model, messages=messages)
-
-    # Make sure we convert the parsed response to a string for counting
-    output_text = (
-        parsed_response if isinstance(parsed_response, str)
-        else json.dumps(parsed_response)
-    )
-    output_tokens = token_counter(model=model, text=output_text)
+    # Token counts as billed by the provider
+    usage = getattr(response, "usage", None)
+    input_tokens = getattr(usage, "prompt_tokens", None)
+    output_tokens = getattr(usage, "completion_tokens", None)
+
+    started = time.perf_counter()
+    source = "provider"
+    if input_tokens is None:
+        input_tokens = _count_tokens_cached(model, "\n".join(str(m["content"]) for m in messages), messages)
+        source = "local"
+    if output_tokens is None:
+        # Make sure we convert the parsed response to a string for counting
+        output_text = (
+            parsed_response if isinstance(parsed_response, str)
+            else json.dumps(parsed_response)
+        )
+        output_tokens = _count_tokens_cached(model, output_text)
+        source = "local"
 
     token_counts = {
         "input_tokens": input_tokens,
         "output_tokens": output_tokens,
+        "usage_source": source,
+        "timings": {**(timings or {}), "tokenization_s": time.perf_counter() - started},
     }
 
     # Calculate the total cost for the request
@@ -122,3 +196,55 @@ def call_llm_model(data,response_format,model,system_message,extra_user_instruct
     return parsed_response, token_counts, cost
 
 
+# One semaphore per provider, keyed by the API key env var MODELS_USED lists for the model,
+# so models sharing a provider account share its limit. Created lazily on the loop that uses them.
+_provider_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def _provider_semaphore(model: str) -> asyncio.Semaphore:
+    provider = list(MODELS_USED[model])[0]
+    if provider not in _provider_semaphores:
+        _provider_semaphores[provider] = asyncio.Semaphore(LLM_CONCURRENCY.get(provider, LLM_DEFAULT_CONCURRENCY))
+    return _provider_semaphores[provider]
+
+
+async def acall_llm_model(data,response_format,model,system_message,extra_user_instruction="",max_tokens=None,use_model_max_tokens_if_none=False,api_key=None,use_cache=True,clean=True):
+    """
+    Async call_llm_model() built on LiteLLM's acompletion. At most LLM_CONCURRENCY[provider]
+    calls per provider are in flight at once. Returns (parsed_response, token_counts, cost).
+
+    Pass api_key when calling from a thread without a Streamlit session (e.g. the crawl loop);
+    otherwise it is looked up with get_api_key() like call_llm_model does.
+    """
+    from litellm import acompletion
+
+    # HTML cleanup and token counting are CPU bound, keep them off the event loop
+    params, messages = await asyncio.to_thread(
+        _prepare_llm_call, data, response_format, model, system_message,
+        extra_user_instruction, max_tokens, use_model_max_tokens_if_none, api_key, clean,
+    )
+    key, cached = await asyncio.to_thread(_cache_lookup, params, use_cache)
+    if cached is not None:
+        return cached
+    queued = time.perf_counter()
+    async with _provider_semaphore(model):
+        started = time.perf_counter()
+        response = await acompletion(**params)
+        network = time.perf_counter() - started
+    timings = {"queue_s": started - queued, "network_s": network}
+    result = await asyncio.to_thread(_finish_llm_call, response, model, messages, timings)
+    await asyncio.to_thread(_cache_store, key, model, result)
+    return result
+
+
+def merge_token_counts(counts: List[Dict[str, object]]) -> Dict[str, object]:
+    """Sum the token counts and timings of several calls (e.g. the chunks of one page)."""
+    timings: Dict[str, float] = {}
+    for entry in counts:
+        for name, seconds in (entry.get("timings") or {}).items():
+            timings[name] = timings.get(name, 0.0) + seconds
+    return {
+        "input_tokens": sum(entry["input_tokens"] for entry in counts),
+        "output_tokens": sum(entry["output_tokens"] for entry in counts),
+        "timings": timings,
+    }
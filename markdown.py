@@ -1,31 +1,55 @@
 # markdown.py
 
 import asyncio
-from typing import List,Optional,Set
+from typing import Iterator,List,Optional,Set,Tuple
 import random
-from api_management import get_supabase_client
-from utils import generate_unique_name
-from apply import URLCrawler
-from crawl4ai import AsyncWebCrawler, CrawlerRunConfig, CacheMode
-from crawl4ai.async_configs import BrowserConfig
+from storage import get_storage
+from datetime import datetime, timezone
+from utils import generate_cache_key, is_fresh
+from browser_pool import BrowserPool, get_browser_pool, run_sync
+from crawl_engine import crawl_site
+from crawl_checkpoint import CRAWL_JOB, save_checkpoint, load_checkpoint, clear_checkpoint
+from page_validators import check_pages_unchanged, crawl_validators
+from assets import MAX_CONCURRENT_URLS, RAW_CACHE_TTL_SECONDS, DEFAULT_FETCH_PROFILE, RAW_PAGE_READ_BATCH
+from fetch_profiles import get_profile
+from raw_codec import encode_raw, decode_raw
+from write_buffer import WriteBuffer
 
-supabase = get_supabase_client()
+# Created lazily on the crawl loop so every batch shares one limit
+_url_semaphore: Optional[asyncio.Semaphore] = None
 
 
+def _get_url_semaphore() -> asyncio.Semaphore:
+    global _url_semaphore
+    if _url_semaphore is None:
+        _url_semaphore = asyncio.Semaphore(MAX_CONCURRENT_URLS)
+    return _url_semaphore
 
-async def get_fit_markdown_async(url: str, depth: int, max_url: int, nextButton: Optional[str] = None, visited_urls: Optional[Set[str]] = None) -> str:
+
+
+async def crawl_pages_async(url: str, depth: int, max_url: int, nextButton: Optional[str] = None, visited_urls: Optional[Set[str]] = None, pool: Optional[BrowserPool] = None, profile: str = DEFAULT_FETCH_PROFILE, on_page=None, pending: Optional[List[Tuple[str, int]]] = None, on_checkpoint=None) -> List[dict]:
     """
-    Async function using crawl4ai's AsyncWebCrawler to produce raw markdown.
-    Ensures it follows internal links at depth=1 and beyond.
+    Async function using crawl4ai's AsyncWebCrawler to fetch a page and its internal
+    links at depth=1 and beyond, returning one dict per fetched page.
+    Pages are fetched on tabs leased from the shared BrowserPool, and links are
+    followed breadth-first by crawl_engine.crawl_site with bounded concurrency.
+    profile picks a FETCH_PROFILES entry; "lean" blocks images, media, fonts and trackers.
+    on_page, if given, is awaited with each page as it arrives (see crawl_site).
+    pending and on_checkpoint resume and checkpoint the crawl (see crawl_site).
     """
+    from crawl4ai import CrawlerRunConfig, CacheMode
+
     if visited_urls is None:
         visited_urls = set()
+    if pool is None:
+        pool = get_browser_pool(profile)
+    fetch_profile = get_profile(profile)
     
     print(f"Starting crawl at {url} with depth={depth}, max_url={max_url}, visited={len(visited_urls)}")
 
     if depth < 0 or len(visited_urls) >= max_url:
         print(f"Stopping crawl: Depth={depth} too low or visited={len(visited_urls)} >= max_url={max_url}")
-        return ""
+        return []
 
     def get_random_user_agent():
         user_agents = [
@@ -35,13 +59,10 @@ async def get_fit_markdown_async(url: str, depth: int, max_url: int, nextButton:
         ]
         return random.choice(user_agents)
 
-    whole_data = ""
-    
     try:
-        browser_config = BrowserConfig()
         config = CrawlerRunConfig(
-            wait_for_images=True,
-            scan_full_page=True,
+            wait_for_images=fetch_profile["wait_for_images"],
+            scan_full_page=fetch_profile["scan_full_page"],
             cache_mode=CacheMode.BYPASS,
             user_agent=get_random_user_agent(),
             js_code=f"""
@@ -59,143 +80,386 @@ async def get_fit_markdown_async(url: str, depth: int, max_url: int, nextButton:
             verbose=True
         )
 
-        async with AsyncWebCrawler(config=browser_config) as async_crawler:
-            # Fetch the current page
-            print(f"Going to: {url}")
-            result = await async_crawler.arun(url, config=config)
-            if not result.success:
-                print(f"Failed to fetch {url}")
-                return whole_data
-            
-            whole_data += result.html
-            visited_urls.add(url)
-            print(f"Fetched: {url} (Depth: {depth}, URLs processed: {len(visited_urls)}/{max_url})")
-
-            # Stop if limits are hit
-            remaining_slots = max_url - len(visited_urls)
-            if remaining_slots <= 0 or depth <= 0:
-                print(f"Stopping: No slots left ({remaining_slots}) or depth={depth} exhausted")
-                return whole_data
-
-            # Get internal links directly from the page
-            internal_links = [link["href"] for link in result.links.get("internal", []) if link["href"]]
-            print(f"Found {len(internal_links)} internal links: {internal_links}")
-            
-            # Filter out visited URLs and limit to remaining slots
-            discovered_urls = set(internal_links) - visited_urls
-            discovered_urls = list(discovered_urls)[:remaining_slots]
-            print(f"Filtered to {len(discovered_urls)} URLs to crawl at depth {depth}: {discovered_urls}")
-
-            # Process each discovered URL
-            for next_url in sorted(discovered_urls):
-                if next_url in visited_urls or len(visited_urls) >= max_url:
-                    print(f"Skipping {next_url}: Already visited or max_url={max_url} reached")
-                    continue
-
-                print(f"Going to: {next_url}")
-                try:
-                    next_result = await async_crawler.arun(next_url, config=config)
-                    if next_result.success:
-                        whole_data += next_result.html
-                        visited_urls.add(next_url)
-                        print(f"Fetched: {next_url} (Depth: {depth}, URLs processed: {len(visited_urls)}/{max_url})")
-                        
-                        # Recurse if depth allows
-                        if depth > 1 and len(visited_urls) < max_url:
-                            print(f"Recursing into {next_url} at depth {depth-1}")
-                            recursive_result = await get_fit_markdown_async(
-                                next_url,
-                                depth - 1,
-                                max_url,
-                                nextButton,
-                                visited_urls
-                            )
-                            whole_data += recursive_result
-                            print(f"Back from recursion at {next_url}, total data length: {len(whole_data)}")
-                    else:
-                        print(f"Failed to fetch {next_url}")
-                except Exception as e:
-                    print(f"Error fetching {next_url}: {e}")
-                    continue
-
-        print(f"Finished crawl from {url}, total URLs: {len(visited_urls)}, data length: {len(whole_data)}")
-        return whole_data
+        # Breadth-first crawl with several pages in flight at once
+        # A next-button selector needs JS on every page, so skip the static fast path
+        pages = await crawl_site(url, depth, max_url - len(visited_urls), config, pool, visited_urls=visited_urls, force_render=bool(nextButton), on_page=on_page, pending=pending, on_checkpoint=on_checkpoint)
+
+        print(f"Finished crawl from {url}, total URLs: {len(visited_urls)}, pages: {len(pages)}")
+        return pages
 
     except Exception as e:
         print(f"Crawl error at {url}: {e}")
-        return whole_data
+        return []
 
 
+async def get_fit_markdown_async(url: str, depth: int, max_url: int, nextButton: Optional[str] = None, visited_urls: Optional[Set[str]] = None, pool: Optional[BrowserPool] = None, profile: str = DEFAULT_FETCH_PROFILE) -> str:
+    """
+    Async function using crawl4ai's AsyncWebCrawler to produce raw markdown.
+    Returns the HTML of every crawled page concatenated.
+    """
+    pages = await crawl_pages_async(url, depth, max_url, nextButton, visited_urls, pool, profile)
+    return "".join(page["html"] for page in pages)
+
 
-def fetch_fit_markdown(url: str, depth, max_url, nextButton) -> str:
+
+def fetch_fit_markdown(url: str, depth, max_url, nextButton, profile: str = DEFAULT_FETCH_PROFILE) -> str:
     """
     Synchronous wrapper around get_fit_markdown_async().
+    Runs on the shared crawl loop so the browser pool survives between calls.
     """
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        return loop.run_until_complete(
-            get_fit_markdown_async(url, depth, max_url, nextButton)
-        )
-    finally:
-        loop.close()
+    return run_sync(get_fit_markdown_async(url, depth, max_url, nextButton, profile=profile))
 
 
-def read_raw_data(unique_name: str) -> str:
+def committed_page_range(row: dict) -> Optional[Tuple[int, int]]:
+    """
+    The (first, end) page_index range of the finished crawl a 'scraped_data' row describes,
+    or None for rows stored before page_base was recorded (all of their pages count).
+    Pages outside the range belong to a previous crawl or to an unfinished re-crawl.
+    """
+    if row.get("page_base") is None or row.get("page_count") is None:
+        return None
+    return row["page_base"], row["page_base"] + row["page_count"]
+
+
+def iter_raw_pages(unique_name: str, batch_size: int = RAW_PAGE_READ_BATCH) -> Iterator[dict]:
     """
-    Query the 'scraped_data' table for the row with this unique_name,
-    and return the 'raw_data' field.
+    Yield the stored pages of a crawl one by one ('url', 'depth', 'status', 'html',
+    'fetched_at'), in the order they were stored. Only batch_size pages are held
+    in memory at a time. Only the pages of the last finished crawl are read (see
+    committed_page_range). Crawls stored before per-page storage come back as a
+    single page holding the old raw_data blob. Compressed HTML is decoded here.
     """
-    response = (
-        supabase.table("scraped_data")
-        .select("raw_data")
-        .eq("unique_name", unique_name)
-        .execute()
+    crawl = get_storage().read_scraped_row(
+        unique_name, ("url", "raw_data", "raw_codec", "fetched_at", "page_base", "page_count")
     )
-    data = response.data
-    if data and len(data) > 0:
-        return data[0]["raw_data"]
-    return ""
+    index_range = committed_page_range(crawl)
+    start = 0
+    while True:
+        rows = get_storage().read_pages(unique_name, start, batch_size, index_range)
+        for row in rows:
+            row["html"] = decode_raw(row["html"], row.pop("codec", None))
+            yield row
+        if len(rows) < batch_size:
+            break
+        start += batch_size
+
+    if start == 0 and not rows and crawl.get("raw_data"):
+        yield {"page_index": 0, "url": crawl["url"], "depth": 0, "status": None,
+               "html": decode_raw(crawl["raw_data"], crawl.get("raw_codec")), "fetched_at": crawl.get("fetched_at")}
+
+
+def read_raw_data(unique_name: str) -> str:
+    """
+    Return the HTML of every stored page for this unique_name, concatenated.
+    Prefer iter_raw_pages() when the pages can be processed one at a time.
+    """
+    return "".join(page["html"] or "" for page in iter_raw_pages(unique_name))
+
+
+def read_raw_row(unique_name: str) -> dict:
+    """
+    Return the cached crawl row for unique_name ('page_count', 'page_base', 'validators',
+    'fetched_at', 'created_at'), or an empty dict if there is none.
+    """
+    return get_storage().read_scraped_row(unique_name, ("page_count", "page_base", "validators", "fetched_at", "created_at"))
+
+
+def delete_raw_pages(unique_name: str, start: int = 0, end: Optional[int] = None) -> None:
+    """
+    Remove the stored pages of a crawl with start <= page_index < end: the previous
+    crawl's pages once a new crawl has stored its own, or the pages stored after the
+    last checkpoint when a crawl resumes. All of them by default.
+    """
+    get_storage().delete_pages(unique_name, start, end)
+
+
+def prune_raw_pages(unique_name: str) -> None:
+    """
+    Remove the pages outside the committed range of a crawl's 'scraped_data' row:
+    the previous crawl's pages, and those of a re-crawl that never finished.
+    """
+    index_range = committed_page_range(read_raw_row(unique_name))
+    if index_range is None:
+        return
+    first, end = index_range
+    if first:
+        delete_raw_pages(unique_name, 0, first)
+    delete_raw_pages(unique_name, end)
+
+
+def raw_page_row(unique_name: str, page_index: int, page: dict) -> dict:
+    """
+    The 'scraped_pages' row for one crawled page, its HTML compressed with
+    RAW_DATA_CODEC. The codec is recorded on the row so reads can decode it.
+    """
+    html, codec = encode_raw(page["html"])
+    return {
+        "unique_name": unique_name,
+        "page_index": page_index,
+        "url": page["url"],
+        "depth": page["depth"],
+        "status": page.get("status"),
+        "html": html,
+        "codec": codec,
+        "fetched_at": page.get("fetched_at") or datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def save_raw_page(unique_name: str, page_index: int, page: dict) -> None:
+    """
+    Store one crawled page as its own row in 'scraped_pages'.
+    """
+    get_storage().save_page(raw_page_row(unique_name, page_index, page))
+
+
+def raw_page_buffer() -> WriteBuffer:
+    """Buffer for raw_page_row() rows, written with bulk upserts."""
+    storage = get_storage()
+    return WriteBuffer(storage.save_pages, storage.save_page, "page")
+
+
+def raw_data_buffer() -> WriteBuffer:
+    """Buffer for raw_data_row() rows, written with bulk upserts."""
+    storage = get_storage()
+    return WriteBuffer(storage.save_scraped_rows, storage.save_scraped_row, "crawl")
 
 
-def save_raw_data(unique_name: str, url: str, raw_data: str) -> None:
+def raw_data_row(unique_name: str, url: str, raw_data: Optional[str] = None, validators: Optional[dict] = None, page_count: Optional[int] = None, page_base: Optional[int] = None) -> dict:
     """
-    Save or update the row in supabase with unique_name, url, and raw_data.
-    If a row with unique_name doesn't exist, it inserts; otherwise it might upsert.
+    The 'scraped_data' row with unique_name and url for a finished crawl.
+    unique_name is a cache key, so an existing row is overwritten and its fetched_at refreshed.
+    Pages live in 'scraped_pages' (see save_raw_page), page_index page_base .. page_base +
+    page_count - 1; raw_data only holds a single blob for callers that store one, and is
+    cleared otherwise.
+    validators maps each crawled page URL to its ETag / Last-Modified / content hash.
     """
-    supabase.table("scraped_data").upsert(
-        {"unique_name": unique_name, "url": url, "raw_data": raw_data}, on_conflict="id"
-    ).execute()
+    stored, codec = encode_raw(raw_data)
+    row = {
+        "unique_name": unique_name,
+        "url": url,
+        "raw_data": stored,
+        "raw_codec": codec,
+        "page_count": page_count,
+        "page_base": page_base,
+        "fetched_at": datetime.now(timezone.utc).isoformat(),
+    }
+    if validators is not None:
+        row["validators"] = validators
+    return row
+
+
+def save_raw_data(unique_name: str, url: str, raw_data: Optional[str] = None, validators: Optional[dict] = None, page_count: Optional[int] = None, page_base: Optional[int] = None) -> None:
+    """
+    Save or update the 'scraped_data' row for a finished crawl (see raw_data_row).
+    """
+    get_storage().save_scraped_row(raw_data_row(unique_name, url, raw_data, validators, page_count, page_base))
     BLUE = "\033[34m"
     RESET = "\033[0m"
     print(f"{BLUE}INFO:Raw data stored for {unique_name}{RESET}")
 
 
-def fetch_and_store_markdowns(urls: List[str], depth, max_url, nextButton) -> List[str]:
+async def _fetch_and_store_one(url: str, unique_name: str, depth, max_url, nextButton, semaphore: asyncio.Semaphore, force_refresh: bool = False, ttl_seconds: float = RAW_CACHE_TTL_SECONDS, revalidate: bool = False, profile: str = DEFAULT_FETCH_PROFILE, rows: Optional[WriteBuffer] = None, checkpoint: Optional[dict] = None) -> bool:
     """
-    For each URL:
-      1) Generate unique_name
-      2) Check if there's already a row in supabase with that unique_name
-      3) If not found or if raw_data is empty, fetch fit_markdown
-      4) Save to supabase
-    Return a list of unique_names (one per URL).
+    Crawl and store one URL unless a usable copy is stored already.
+    Returns True if the stored pages changed (i.e. the URL was crawled again).
+    The crawl's 'scraped_data' row goes to the rows buffer when one is given.
+
+    The crawl is checkpointed under unique_name as it goes (see crawl_checkpoint.py).
+    If an earlier crawl of unique_name was interrupted less than ttl_seconds ago, it is
+    resumed: the pages it stored are kept and only the rest of its frontier is crawled.
+    Pass checkpoint to resume from a given checkpoint whatever its age; force_refresh
+    ignores checkpoints and starts over.
     """
-    unique_names = []
+    MAGENTA = "\033[35m"
+    RESET = "\033[0m"
+    async with semaphore:
+        # An interrupted crawl with the same URL and parameters is picked up where it stopped
+        if checkpoint is None and not force_refresh:
+            checkpoint = await asyncio.to_thread(load_checkpoint, unique_name, ttl_seconds)
+        state = (checkpoint or {}).get("state") or {}
 
-    for url in urls:
-        unique_name = generate_unique_name(url)
-        MAGENTA = "\033[35m"
-        RESET = "\033[0m"
-        # check if we already have raw_data in supabase
-        raw_data = read_raw_data(unique_name)
-        if raw_data:
+        # check if we already have a fresh crawl in storage (blocking client, so off the loop);
+        # not while a checkpoint exists, the interrupted crawl has replaced some of its pages
+        row = {} if force_refresh or state else await asyncio.to_thread(read_raw_row, unique_name)
+        fetched_at = row.get("fetched_at") or row.get("created_at")
+        # Scheduled runs always go through the conditional check below, however recent the crawl
+        if not revalidate and row.get("page_count") and is_fresh(fetched_at, ttl_seconds):
             print(
-                f"{MAGENTA}Found existing data in supabase for {url} => {unique_name}{RESET}"
+                f"{MAGENTA}Found existing stored data for {url} => {unique_name}{RESET}"
+            )
+            return False
+
+        refreshed = {}
+        if revalidate and row.get("page_count") and row.get("validators"):
+            # Cheap conditional GETs first; only render again if some page changed
+            unchanged, refreshed = await check_pages_unchanged(row["validators"])
+            if unchanged:
+                print(f"{MAGENTA}Unchanged since last crawl: {url} => {unique_name}{RESET}")
+                return False
+
+        if state:
+            print(f"{MAGENTA}Resuming crawl of {url} => {unique_name}: {state['page_count']} pages stored, {len(state['pending'])} URLs left{RESET}")
+
+        # Pages are buffered and written in bulk as they arrive, so only a few pages
+        # of HTML are in memory at once. They are stored after every page already stored;
+        # readers keep seeing the previous crawl's pages until the new row points at these.
+        page_count = state.get("page_count", 0)
+        if state:
+            base = state.get("base", 0)
+            # Pages stored after the last checkpoint are dropped, their URLs are still pending
+            await asyncio.to_thread(delete_raw_pages, unique_name, base + page_count)
+        else:
+            last = await asyncio.to_thread(get_storage().last_page_index, unique_name)
+            base = 0 if last is None else last + 1
+        page_buffer = raw_page_buffer()
+        validators = dict(state.get("validators") or {})
+        params = {"kind": CRAWL_JOB, "depth": depth, "max_url": max_url, "nextButton": nextButton, "profile": profile}
+
+        def buffer_page(page_index: int, page: dict) -> None:
+            page_buffer.add(raw_page_row(unique_name, page_index, page))
+
+        async def store_page(page: dict) -> None:
+            nonlocal page_count
+            page_index = base + page_count
+            page_count += 1
+            # Validators from the conditional check come from a plain GET, which is what
+            # the next check compares against, so prefer them over the rendered page's
+            validators[page["url"]] = refreshed.get(page["url"]) or await crawl_validators(page)
+            await asyncio.to_thread(buffer_page, page_index, page)
+
+        async def store_checkpoint(progress: dict) -> None:
+            # Taken between on_page calls, so page_count matches progress["visited"]
+            progress = {**progress, "base": base, "page_count": page_count, "validators": dict(validators)}
+            # The checkpoint may only count pages that are written
+            await asyncio.to_thread(page_buffer.flush)
+            if page_buffer.failures:
+                return
+            await asyncio.to_thread(save_checkpoint, unique_name, url, params, progress)
+
+        try:
+            pages = await crawl_pages_async(
+                url, depth, max_url, nextButton,
+                visited_urls=set(state["visited"]) if state else None,
+                profile=profile,
+                on_page=store_page,
+                pending=[tuple(item) for item in state["pending"]] if state else None,
+                on_checkpoint=store_checkpoint,
             )
+        finally:
+            failed = await asyncio.to_thread(page_buffer.close)
+        if failed:
+            print(f"{MAGENTA}{len(failed)} of {page_count} pages of {url} could not be stored{RESET}")
+        if base and page_count == len(failed):
+            print(f"{MAGENTA}No pages of {url} were stored, keeping the previous crawl of {unique_name}{RESET}")
+            await asyncio.to_thread(clear_checkpoint, unique_name)
+            return False
+        saved = sum(page["blocked"]["bytes_saved_est"] for page in pages if page.get("blocked"))
+        if saved:
+            print(f"{MAGENTA}Lean profile saved ~{saved // 1024} KB across {len(pages)} pages of {url}{RESET}")
+        if rows is not None:
+            # Older pages are pruned once the buffered row is written (see _fetch_and_store_all)
+            await asyncio.to_thread(rows.add, raw_data_row(unique_name, url, None, validators, page_count, base))
         else:
-            # fetch fit markdown
-            fit_md = fetch_fit_markdown(url, depth, max_url, nextButton)
-            save_raw_data(unique_name, url, fit_md)
-        unique_names.append(unique_name)
+            await asyncio.to_thread(save_raw_data, unique_name, url, None, validators, page_count, base)
+            if base:
+                await asyncio.to_thread(delete_raw_pages, unique_name, 0, base)
+        await asyncio.to_thread(clear_checkpoint, unique_name)
+        return True
+
+
+async def fetch_and_store_one_async(url: str, depth, max_url, nextButton, force_refresh: bool = False, ttl_seconds: float = RAW_CACHE_TTL_SECONDS, profile: str = DEFAULT_FETCH_PROFILE, rows: Optional[WriteBuffer] = None) -> Tuple[str, bool]:
+    """
+    Crawl and store a single URL (sharing the MAX_CONCURRENT_URLS limit with every other
+    crawl), for callers that handle each URL as soon as it is stored, like pipeline.py.
+    Return (unique_name, whether the stored pages changed).
+    """
+    unique_name = generate_cache_key(url, depth, max_url, nextButton)
+    changed = await _fetch_and_store_one(url, unique_name, depth, max_url, nextButton, _get_url_semaphore(), force_refresh, ttl_seconds, False, profile, rows)
+    return unique_name, changed
+
+
+async def resume_crawl_async(job_id: str) -> Tuple[str, bool]:
+    """
+    Resume an interrupted crawl from its last checkpoint. job_id is the crawl's
+    unique_name (see crawl_checkpoint.unfinished_jobs for the ones left over).
+    The checkpoint is used whatever its age. Return (unique_name, whether the stored pages changed).
+    """
+    checkpoint = await asyncio.to_thread(load_checkpoint, job_id)
+    if not checkpoint:
+        raise ValueError(f"No checkpoint stored for crawl job {job_id!r}")
+    params = checkpoint["params"]
+    if params.get("kind") != CRAWL_JOB:
+        raise ValueError(f"Crawl job {job_id!r} is a {params.get('kind')!r} job, not a page crawl")
+    changed = await _fetch_and_store_one(
+        checkpoint["url"], job_id, params["depth"], params["max_url"], params["nextButton"], _get_url_semaphore(),
+        profile=params["profile"], checkpoint=checkpoint,
+    )
+    return job_id, changed
+
+
+def resume_crawl(job_id: str) -> Tuple[str, bool]:
+    """Synchronous wrapper around resume_crawl_async(), run on the shared crawl loop."""
+    return run_sync(resume_crawl_async(job_id))
+
+
+async def _fetch_and_store_all(urls: List[str], depth, max_url, nextButton, force_refresh: bool, ttl_seconds: float, revalidate: bool, profile: str = DEFAULT_FETCH_PROFILE) -> Tuple[List[str], Set[str]]:
+    unique_names = [generate_cache_key(url, depth, max_url, nextButton) for url in urls]
+
+    # The same URL submitted twice is only crawled once
+    jobs = {}
+    semaphore = _get_url_semaphore()
+    # Crawl rows are written together once every URL is done (or the buffer fills up)
+    rows = raw_data_buffer()
+    for url, unique_name in zip(urls, unique_names):
+        if unique_name not in jobs:
+            jobs[unique_name] = _fetch_and_store_one(url, unique_name, depth, max_url, nextButton, semaphore, force_refresh, ttl_seconds, revalidate, profile, rows)
+    try:
+        changed_flags = await asyncio.gather(*jobs.values())
+    finally:
+        failed = await asyncio.to_thread(rows.close)
+    BLUE = "\033[34m"
+    RESET = "\033[0m"
+    print(f"{BLUE}INFO:Raw data stored for {rows.written} crawls{RESET}")
+    for row, error in failed:
+        print(f"Crawl of {row['url']} was fetched but its row could not be stored: {error}")
+    changed = {unique_name for unique_name, was_changed in zip(jobs, changed_flags) if was_changed}
+    # The rows now point at the new pages; a crawl whose row failed keeps its previous pages
+    unwritten = {row["unique_name"] for row, _ in failed}
+    for unique_name in changed - unwritten:
+        await asyncio.to_thread(prune_raw_pages, unique_name)
+    return unique_names, changed
+
 
+async def fetch_and_store_markdowns_async(urls: List[str], depth, max_url, nextButton, force_refresh: bool = False, ttl_seconds: float = RAW_CACHE_TTL_SECONDS, profile: str = DEFAULT_FETCH_PROFILE) -> List[str]:
+    """
+    Fetch every URL concurrently (at most MAX_CONCURRENT_URLS at a time across the
+    whole process) and store each crawl (see storage.py).
+    unique_names are cache keys built from the normalized URL and crawl parameters;
+    a stored crawl younger than ttl_seconds is reused unless force_refresh is set.
+    Return a list of unique_names in the same order as urls.
+    """
+    unique_names, _ = await _fetch_and_store_all(urls, depth, max_url, nextButton, force_refresh, ttl_seconds, revalidate=False, profile=profile)
     return unique_names
+
+
+def fetch_and_store_markdowns(urls: List[str], depth, max_url, nextButton, force_refresh: bool = False, profile: str = DEFAULT_FETCH_PROFILE) -> List[str]:
+    """
+    For each URL:
+      1) Generate unique_name (a cache key for the URL and crawl parameters)
+      2) Check if there's already a fresh stored row with that unique_name
+      3) If not found, stale, empty or force_refresh is set, fetch fit_markdown
+      4) Save to storage
+    Return a list of unique_names (one per URL).
+    Synchronous wrapper around fetch_and_store_markdowns_async() for Streamlit and cron.
+    """
+    return run_sync(fetch_and_store_markdowns_async(urls, depth, max_url, nextButton, force_refresh, profile=profile))
+
+
+def refresh_markdowns(urls: List[str], depth, max_url, nextButton, profile: str = DEFAULT_FETCH_PROFILE) -> Tuple[List[str], Set[str]]:
+    """
+    Like fetch_and_store_markdowns(), for scheduled re-scrapes: every stored crawl, however
+    recent, is first revalidated with conditional GETs (ETag / Last-Modified / body hash)
+    and only rendered and written again if one of its pages changed.
+    Return (unique_names, the unique_names whose stored pages changed).
+    """
+    return run_sync(_fetch_and_store_all(urls, depth, max_url, nextButton, False, RAW_CACHE_TTL_SECONDS, revalidate=True, profile=profile))
@@ -0,0 +1,48 @@
+# migrate_raw_codec.py
+#
+# Compress the HTML of rows stored before raw_codec.py existed.
+# Run migrations/004_raw_codec.sql first, then: python migrate_raw_codec.py
+
+from api_management import get_supabase_client
+from assets import RAW_PAGE_READ_BATCH
+from raw_codec import encode_raw, resolve_codec
+
+supabase = get_supabase_client()
+
+
+def _migrate_table(table: str, column: str, codec_column: str) -> int:
+    codec = resolve_codec()
+    if codec == "none":
+        print("RAW_DATA_CODEC is 'none', nothing to compress")
+        return 0
+
+    migrated = 0
+    while True:
+        # Rows drop out of the filter once compressed, so always read the first batch
+        response = (
+            supabase.table(table)
+            .select("id", column)
+            .is_(codec_column, "null")
+            .not_.is_(column, "null")
+            .limit(RAW_PAGE_READ_BATCH)
+            .execute()
+        )
+        rows = response.data or []
+        if not rows:
+            break
+        for row in rows:
+            stored, used = encode_raw(row[column], codec)
+            supabase.table(table).update({column: stored, codec_column: used}).eq("id", row["id"]).execute()
+            migrated += 1
+        print(f"{table}: compressed {migrated} rows")
+    return migrated
+
+
+def migrate_raw_codec() -> None:
+    pages = _migrate_table("scraped_pages", "html", "codec")
+    blobs = _migrate_table("scraped_data", "raw_data", "raw_codec")
+    print(f"Done: {pages} pages and {blobs} legacy raw_data rows compressed")
+
+
+if __name__ == "__main__":
+    migrate_raw_codec()
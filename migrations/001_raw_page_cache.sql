@@ -0,0 +1,12 @@
+-- Cache crawled pages by a deterministic unique_name (see utils.generate_cache_key).
+-- Run once in the Supabase SQL Editor on databases created before this change.
+
+ALTER TABLE scraped_data ADD COLUMN IF NOT EXISTS fetched_at TIMESTAMPTZ;
+UPDATE scraped_data SET fetched_at = created_at WHERE fetched_at IS NULL;
+
+-- Keep only the newest row per unique_name so the unique constraint can be added
+DELETE FROM scraped_data a
+USING scraped_data b
+WHERE a.unique_name = b.unique_name AND a.id < b.id;
+
+ALTER TABLE scraped_data ADD CONSTRAINT scraped_data_unique_name_key UNIQUE (unique_name);
@@ -0,0 +1,4 @@
+-- Per-page ETag / Last-Modified / content hash used by scheduled re-scrapes
+-- (see page_validators.py).
+
+ALTER TABLE scraped_data ADD COLUMN IF NOT EXISTS validators JSONB;
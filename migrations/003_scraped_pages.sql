@@ -0,0 +1,16 @@
+-- Store each crawled page as its own row instead of one concatenated raw_data blob
+-- (see markdown.save_raw_page / iter_raw_pages).
+
+CREATE TABLE IF NOT EXISTS scraped_pages (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    unique_name TEXT NOT NULL,
+    page_index INT NOT NULL,
+    url TEXT,
+    depth INT,
+    status INT,
+    html TEXT,
+    fetched_at TIMESTAMPTZ DEFAULT NOW(),
+    UNIQUE (unique_name, page_index)
+);
+
+ALTER TABLE scraped_data ADD COLUMN IF NOT EXISTS page_count INT;
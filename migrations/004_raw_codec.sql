@@ -0,0 +1,6 @@
+-- Record the compression codec of stored HTML per row (see raw_codec.py).
+-- NULL means the value is stored as plain text, which is what every existing row holds.
+-- Run migrate_raw_codec.py afterwards to compress rows stored before this change.
+
+ALTER TABLE scraped_pages ADD COLUMN IF NOT EXISTS codec TEXT;
+ALTER TABLE scraped_data ADD COLUMN IF NOT EXISTS raw_codec TEXT;
@@ -0,0 +1,11 @@
+-- Progress of unfinished crawls (visited URLs, frontier, stored page count), so a
+-- crawl interrupted by a crash or restart resumes instead of starting over
+-- (see crawl_checkpoint.py).
+
+CREATE TABLE IF NOT EXISTS crawl_checkpoints (
+    job_id TEXT PRIMARY KEY,
+    url TEXT,
+    params JSONB,
+    state JSONB,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
@@ -0,0 +1,6 @@
+-- Record where a finished crawl's pages start in 'scraped_pages'. A re-crawl stores its
+-- pages after the previous crawl's, so readers only return page_base .. page_base +
+-- page_count - 1 and never see the pages of an unfinished or interrupted re-crawl.
+-- NULL (rows stored before this change) means every page of the crawl is read.
+
+ALTER TABLE scraped_data ADD COLUMN IF NOT EXISTS page_base INT;
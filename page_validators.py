@@ -0,0 +1,114 @@
+# page_validators.py
+
+import asyncio
+import hashlib
+from typing import Dict, Mapping, Optional, Tuple
+
+import httpx
+
+from assets import REVALIDATE_TIMEOUT, REVALIDATE_CONCURRENCY
+from static_fetch import get_http_client
+
+
+def content_hash(body: Optional[str]) -> Optional[str]:
+    if body is None:
+        return None
+    return hashlib.sha256((body or "").encode("utf-8", errors="ignore")).hexdigest()
+
+
+def _header(headers: Optional[Mapping[str, str]], name: str) -> Optional[str]:
+    if not headers:
+        return None
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def validators_from_response(headers: Optional[Mapping[str, str]], body: Optional[str]) -> Dict[str, Optional[str]]:
+    """
+    Build the validators we keep per page: ETag and Last-Modified when the server
+    sends them, and a body hash as the fallback comparison. body must be a plain GET
+    response body (what check_page_unchanged hashes), or None for no hash.
+    """
+    return {
+        "etag": _header(headers, "etag"),
+        "last_modified": _header(headers, "last-modified"),
+        "content_hash": content_hash(body),
+    }
+
+
+async def check_page_unchanged(client: httpx.AsyncClient, url: str, stored: Dict[str, Optional[str]]) -> Tuple[bool, Dict[str, Optional[str]]]:
+    """
+    Conditional GET for one page. Returns (unchanged, validators) where validators
+    are the ones to store from now on. Any error counts as changed.
+    """
+    request_headers = {}
+    if stored.get("etag"):
+        request_headers["If-None-Match"] = stored["etag"]
+    if stored.get("last_modified"):
+        request_headers["If-Modified-Since"] = stored["last_modified"]
+
+    try:
+        response = await client.get(url, headers=request_headers, timeout=REVALIDATE_TIMEOUT)
+    except Exception as e:
+        print(f"Revalidation failed for {url}: {e}")
+        return False, stored
+
+    if response.status_code == 304:
+        refreshed = dict(stored)
+        refreshed["etag"] = response.headers.get("etag") or stored.get("etag")
+        return True, refreshed
+    if response.status_code != 200:
+        return False, stored
+
+    current = validators_from_response(response.headers, response.text)
+    if stored.get("etag") and current["etag"]:
+        return stored["etag"] == current["etag"], current
+    if stored.get("last_modified") and current["last_modified"]:
+        return stored["last_modified"] == current["last_modified"], current
+    return stored.get("content_hash") is not None and stored["content_hash"] == current["content_hash"], current
+
+
+async def crawl_validators(page: dict) -> Dict[str, Optional[str]]:
+    """
+    Validators for a page just crawled by crawl_engine.crawl_site. A rendered page's HTML
+    never hashes like the plain GET check_page_unchanged makes, so when the page was
+    rendered and the server sent no ETag / Last-Modified, the hash is taken from a plain
+    GET of the page instead (and left out if that fails).
+    """
+    if page.get("static"):
+        return validators_from_response(page["headers"], page["html"])
+    validators = validators_from_response(page["headers"], None)
+    if validators["etag"] or validators["last_modified"]:
+        return validators
+    try:
+        response = await get_http_client().get(page["url"], timeout=REVALIDATE_TIMEOUT)
+    except Exception as e:
+        print(f"Plain GET for the validators of {page['url']} failed: {e}")
+        return validators
+    if response.status_code != 200:
+        return validators
+    return validators_from_response(response.headers, response.text)
+
+
+async def check_pages_unchanged(validators: Dict[str, Dict[str, Optional[str]]]) -> Tuple[bool, Dict[str, Dict[str, Optional[str]]]]:
+    """
+    Revalidate every page of a stored crawl concurrently.
+    Returns (all_unchanged, refreshed validators per url).
+    """
+    if not validators:
+        return False, {}
+
+    semaphore = asyncio.Semaphore(REVALIDATE_CONCURRENCY)
+
+    async def check(client, url, stored):
+        async with semaphore:
+            return await check_page_unchanged(client, url, stored)
+
+    client = get_http_client()
+    urls = list(validators)
+    results = await asyncio.gather(*(check(client, url, validators[url]) for url in urls))
+
+    refreshed = {url: result[1] for url, result in zip(urls, results)}
+    return all(result[0] for result in results), refreshed
@@ -1,16 +1,20 @@
 # pagination.py
 
+import asyncio
 import json
-from typing import List, Dict
+from typing import List, Dict, Optional
 from assets import PROMPT_PAGINATION
-from markdown import read_raw_data
-from api_management import get_supabase_client
+from markdown import iter_raw_pages, read_raw_data
+from pagination_detector import detect_pagination
+from parsed_page import ParsedPage
+from storage import get_storage
+from write_buffer import WriteBuffer
 from pydantic import BaseModel, Field
 from typing import List
 from pydantic import create_model
-from llm_calls import (call_llm_model)
-
-supabase = get_supabase_client()
+from llm_calls import (acall_llm_model)
+from api_management import get_api_key
+from browser_pool import run_sync
 
 
 class PaginationModel(BaseModel):
@@ -42,7 +46,13 @@ def build_pagination_prompt(indications: str, url: str) -> str:
     return prompt
 
 
-def save_pagination_data(unique_name: str, pagination_data):
+def pagination_data_buffer() -> WriteBuffer:
+    """Buffer for {"unique_name", "pagination_data"} rows, written with bulk updates."""
+    storage = get_storage()
+    return WriteBuffer(storage.update_scraped_rows, lambda row: storage.update_scraped_rows([row]), "pagination_data")
+
+
+def save_pagination_data(unique_name: str, pagination_data, buffer: Optional[WriteBuffer] = None):
        # if it's a pydantic object, convert to dict
     if hasattr(pagination_data, "dict"):
         pagination_data = pagination_data.dict()
@@ -54,43 +64,99 @@ def save_pagination_data(unique_name: str, pagination_data):
         except json.JSONDecodeError:
             pagination_data = {"raw_text": pagination_data}
 
-    supabase.table("scraped_data").update({
-        "pagination_data": pagination_data
-    }).eq("unique_name", unique_name).execute()
+    if buffer is not None:
+        buffer.add({"unique_name": unique_name, "pagination_data": pagination_data})
+        return
+    get_storage().save_pagination_data(unique_name, pagination_data)
     MAGENTA = "\033[35m"
     RESET = "\033[0m" 
     print(f"{MAGENTA}INFO:Pagination data saved for {unique_name}{RESET}")
 
-def paginate_urls(unique_names: List[str], selected_model: str, indication: str, urls:List[str]):
+def detect_stored_pagination(uniq: str, current_url: str) -> Optional[Dict[str, object]]:
+    """
+    Rule-based pagination detection (pagination_detector.detect_pagination) on the links
+    of the crawl's first stored page. None if nothing is stored or no pattern is clear.
+    """
+    page = next(iter_raw_pages(uniq, batch_size=1), None)
+    if not page or not page.get("html"):
+        return None
+    parsed = ParsedPage(page["html"], page.get("url") or current_url)
+    links = [link["href"] for link in parsed.links["internal"]]
+    return detect_pagination(parsed.url, links, parsed.rel_next)
+
+
+async def detect_pagination_async(uniq: str, current_url: str, selected_model: str, indication: str, api_key: Optional[str] = None):
+    """
+    Detect the pagination URLs of one stored crawl: from the page's links when the
+    pattern is clear (no tokens, no cost), else with the LLM. User indications are
+    meant for the LLM, so with indications it is always asked.
+    Return (pagination_data, token_counts, cost), or None if nothing is stored for it.
+    """
+    if not (indication or "").strip():
+        detected = await asyncio.to_thread(detect_stored_pagination, uniq, current_url)
+        if detected is not None:
+            print(f"Pagination of {uniq} detected from its links ({detected['method']}): {len(detected['page_urls'])} pages")
+            return {"page_urls": detected["page_urls"]}, {"input_tokens": 0, "output_tokens": 0}, 0.0
+
+    raw_data = await asyncio.to_thread(read_raw_data, uniq)
+    if not raw_data:
+        print(f"No raw_data found for {uniq}, skipping pagination.")
+        return None
+
+    full_indication=build_pagination_prompt(indication or "",current_url)
+    return await acall_llm_model(raw_data, get_pagination_response_format(),selected_model, full_indication, api_key=api_key)
+
+async def paginate_urls_async(unique_names: List[str], selected_model: str, indication: str, urls:List[str], api_key: Optional[str] = None):
     """
-    For each unique_name, read raw_data, detect pagination, save results,
-    accumulate cost usage, and return a final summary.
+    For each unique_name, concurrently read raw_data, detect pagination and save results,
+    then accumulate cost usage and return a final summary. Results keep the input
+    order; a page whose detection fails is logged and left out.
     """
     total_input_tokens = 0
     total_output_tokens = 0
     total_cost = 0
     pagination_results = []
+    buffer = pagination_data_buffer()
+    print("model",selected_model)
 
-    for uniq,current_url in zip(unique_names, urls):
-        raw_data = read_raw_data(uniq)
-        if not raw_data:
-            print(f"No raw_data found for {uniq}, skipping pagination.")
-            continue
-
-        print("model",selected_model)
-        response_schema=get_pagination_response_format()
-        full_indication=build_pagination_prompt(indication,current_url)
-        pag_data, token_counts, cost = call_llm_model(raw_data, response_schema,selected_model, full_indication)
+    async def detect(uniq, current_url):
+        result = await detect_pagination_async(uniq, current_url, selected_model, indication, api_key)
+        if result is None:
+            return None
 
         # store
-        save_pagination_data(uniq, pag_data)
+        await asyncio.to_thread(save_pagination_data, uniq, result[0], buffer)
+        return result
+
+    pairs = list(zip(unique_names, urls))
+    results = await asyncio.gather(*(detect(uniq, current_url) for uniq, current_url in pairs), return_exceptions=True)
+
+    for (uniq, current_url), result in zip(pairs, results):
+        if isinstance(result, BaseException):
+            print(f"Pagination detection failed for {uniq}: {result}")
+            continue
+        if result is None:
+            continue
+        pag_data, token_counts, cost = result
 
         # accumulate cost
-        
         total_input_tokens += token_counts["input_tokens"]
         total_output_tokens += token_counts["output_tokens"]
         total_cost += cost
 
         pagination_results.append({"unique_name": uniq,"pagination_data": pag_data})
 
+    failed = await asyncio.to_thread(buffer.close)
+    MAGENTA = "\033[35m"
+    RESET = "\033[0m"
+    print(f"{MAGENTA}INFO:Pagination data saved for {buffer.written} of {buffer.written + len(failed)} pages{RESET}")
     return total_input_tokens, total_output_tokens, total_cost, pagination_results
+
+
+def paginate_urls(unique_names: List[str], selected_model: str, indication: str, urls:List[str]):
+    """
+    Blocking wrapper around paginate_urls_async(), run on the shared crawl loop.
+    """
+    # Looked up here: the crawl loop's thread has no Streamlit session to read keys from
+    api_key = get_api_key(selected_model)
+    return run_sync(paginate_urls_async(unique_names, selected_model, indication, urls, api_key))
@@ -0,0 +1,169 @@
+# pagination_detector.py
+
+import re
+from bisect import bisect_left
+from math import gcd
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urldefrag, urlsplit, urlunsplit
+
+from assets import PAGINATION_MAX_PAGES
+
+# Query parameters that hold a page number. The ambiguous ones (p=123 is a post id on
+# WordPress) need two page links or a rel="next" link to back them up.
+PAGE_PARAMS = {"page", "paged", "pagenum", "page_num", "pagenumber", "page_number", "pageno", "currentpage"}
+AMBIGUOUS_PAGE_PARAMS = {"p", "pg", "pn"}
+OFFSET_PARAMS = {"offset", "start", "skip", "startindex", "start_index"}
+LIMIT_PARAMS = {"limit", "per_page", "perpage", "page_size", "pagesize", "size", "count", "rows"}
+# Path segments followed by the page number: /page/3, /p/3
+PAGE_SEGMENTS = {"page", "p", "pg", "pages"}
+# A path segment that is the page number itself: /page-3, /page3, /p3
+PAGE_SEGMENT_RE = re.compile(r"^(page|p)([-_]?)(\d{1,5})$", re.IGNORECASE)
+
+# Stands for the page number (or offset) in a URL template
+_MARK = "\x00"
+
+
+def _template(scheme, netloc, segments, query, fragment="") -> str:
+    return urlunsplit((scheme, netloc, "/".join(segments), urlencode(query, safe=_MARK + "/:"), fragment))
+
+
+def _slots(url: str) -> List[Tuple[str, str, int, str, Optional[int]]]:
+    """
+    The places in a URL that can hold a page number, as (kind, template, value,
+    first-page URL, limit): kind is "page", "ambiguous" or "offset"; template has _MARK
+    where the number goes; first-page URL is the URL with the slot removed; limit is
+    the page size of an offset/limit pair.
+    """
+    scheme, netloc, path, query, _ = urlsplit(urldefrag(url)[0])
+    segments = path.split("/")
+    pairs = parse_qsl(query, keep_blank_values=True)
+    slots = []
+
+    for index, (name, value) in enumerate(pairs):
+        if not value.isdigit() or len(value) > 7:
+            continue
+        lowered = name.lower()
+        if lowered in PAGE_PARAMS or lowered in AMBIGUOUS_PAGE_PARAMS or lowered in OFFSET_PARAMS:
+            kind = "page" if lowered in PAGE_PARAMS else "ambiguous" if lowered in AMBIGUOUS_PAGE_PARAMS else "offset"
+            limit = None
+            if kind == "offset":
+                limit = next((int(v) for n, v in pairs if n.lower() in LIMIT_PARAMS and v.isdigit() and int(v) > 0), None)
+            templated = pairs[:index] + [(name, _MARK)] + pairs[index + 1:]
+            stripped = pairs[:index] + pairs[index + 1:]
+            slots.append((kind, _template(scheme, netloc, segments, templated), int(value),
+                          _template(scheme, netloc, segments, stripped), limit))
+
+    for index, segment in enumerate(segments):
+        if segment.isdigit() and len(segment) <= 5 and index > 0 and segments[index - 1].lower() in PAGE_SEGMENTS:
+            value = int(segment)
+            templated = segments[:index] + [_MARK] + segments[index + 1:]
+            stripped = segments[:index - 1] + segments[index + 1:]
+        else:
+            match = PAGE_SEGMENT_RE.match(segment)
+            if not match:
+                continue
+            value = int(match.group(3))
+            templated = segments[:index] + [match.group(1) + match.group(2) + _MARK] + segments[index + 1:]
+            stripped = segments[:index] + segments[index + 1:]
+        slots.append(("page", _template(scheme, netloc, templated, pairs), value,
+                      _template(scheme, netloc, stripped, pairs), None))
+    return slots
+
+
+def _normalize(url: str) -> str:
+    scheme, netloc, path, query, _ = urlsplit(urldefrag(url)[0])
+    return urlunsplit((scheme, netloc.lower(), path.rstrip("/") or "/", urlencode(sorted(parse_qsl(query, keep_blank_values=True))), ""))
+
+
+def detect_pagination(page_url: str, links: Iterable[str], rel_next: Optional[str] = None) -> Optional[Dict[str, object]]:
+    """
+    Find the page-numbering pattern among a page's links: ?page=N style parameters,
+    /page/N path segments, offset/limit pairs, and the rel="next" link.
+
+    Only numbering that belongs to page_url counts: page_url itself is numbered, or is the
+    first page of the numbered URLs, or the numbered URLs include rel_next.
+
+    Return {"page_urls": [...], "pattern": ..., "method": ...} with every page from the
+    first to the highest one linked (at most PAGINATION_MAX_PAGES, around the current
+    page), or None when no pattern is clear enough, in which case the caller should ask the LLM.
+    """
+    groups: Dict[str, Dict[str, object]] = {}
+    candidates = list(dict.fromkeys([page_url, *links] + ([rel_next] if rel_next else [])))
+    for url in candidates:
+        for kind, template, value, first_page, limit in _slots(url):
+            key = _normalize(template.replace(_MARK, "0")) + "|" + kind
+            group = groups.setdefault(key, {"kind": kind, "template": template, "first_page": first_page,
+                                            "values": set(), "limit": limit, "current": None, "next": False,
+                                            "next_value": None})
+            group["values"].add(value)
+            group["limit"] = group["limit"] or limit
+            if url == page_url:
+                group["current"] = value
+            if rel_next and url == rel_next:
+                group["next"] = True
+                group["next_value"] = value
+
+    best = None
+    page_key = _normalize(page_url)
+    for group in groups.values():
+        values, current = group["values"], group["current"]
+        if not values - {current}:
+            continue
+        # Only the current page's own sequence: it is one of the numbered pages, it is the
+        # page without the number, or the sequence holds its rel="next". A ?page=2 link to
+        # another listing (a blog sidebar, a news widget) is left to the LLM.
+        if current is None and not group["next"] and _normalize(group["first_page"]) != page_key:
+            continue
+        # Page numbers are small and the links near the current page are its neighbours
+        near = min(values) <= 3 or (current is not None and bool({current - 1, current + 1} & values))
+        if group["kind"] == "page":
+            confident = near or group["next"]
+        elif group["kind"] == "ambiguous":
+            confident = group["next"] or (len(values) >= 2 and near)
+        else:
+            confident = group["limit"] is not None or len(values) >= 2 or group["next"]
+        if not confident:
+            continue
+        score = (group["next"], len(values), group["kind"] != "offset")
+        if best is None or score > best[0]:
+            best = (score, group)
+
+    if best is None:
+        if rel_next:
+            return {"page_urls": [rel_next], "pattern": None, "method": "rel_next"}
+        return None
+
+    group = best[1]
+    template = group["template"]
+    values = sorted(group["values"])
+    # The page without the number is the first page when it is the page itself (/products
+    # next to /products?page=2); otherwise the first page gets the number too
+    first_is_bare = group["current"] is None and _normalize(group["first_page"]) == page_key
+
+    if group["kind"] == "offset":
+        # The page size: the limit parameter, else the spacing of the linked offsets
+        step = group["limit"] or 0
+        for low, high in zip(values, values[1:]):
+            step = gcd(step, high - low)
+        step = step or values[0] or 1
+        start = values[0] % step  # 0, or 1 for 1-based offsets
+        numbers = list(range(start, values[-1] + 1, step))
+    else:
+        start = min(values[0], 1)
+        numbers = list(range(start, values[-1] + 1))
+    # A longer sequence is cut to PAGINATION_MAX_PAGES centred on the current page (or the
+    # one before rel="next"), so a page deep in the listing keeps its neighbours
+    anchor = group["current"] if group["current"] is not None else group["next_value"]
+    first = 0
+    if anchor is not None and len(numbers) > PAGINATION_MAX_PAGES:
+        index = bisect_left(numbers, anchor)
+        first = min(max(index - PAGINATION_MAX_PAGES // 2, 0), len(numbers) - PAGINATION_MAX_PAGES)
+    numbers = numbers[first:first + PAGINATION_MAX_PAGES]
+
+    page_urls = []
+    for number in numbers:
+        if number == start and first_is_bare:
+            page_urls.append(page_url)
+        else:
+            page_urls.append(template.replace(_MARK, str(number)))
+    return {"page_urls": page_urls, "pattern": template.replace(_MARK, "{n}"), "method": group["kind"]}
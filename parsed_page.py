@@ -0,0 +1,105 @@
+# parsed_page.py
+
+from functools import cached_property
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urldefrag, urljoin, urlparse
+
+# Never visible text
+NON_TEXT_TAGS = {"script", "style", "noscript", "template", "head"}
+# Page chrome that clean_html_from_string has always dropped before handing text to the LLM
+BOILERPLATE_TAGS = {"script", "style", "footer", "header", "nav", "aside", "advertisement", "ads"}
+
+
+class ParsedPage:
+    """
+    One HTML page parsed once with lxml and shared by every consumer: the LLM cleanup
+    (cleaned_text), manual extraction (select / text), the crawler (links) and metadata.
+    Text is read by walking the tree and skipping tags, so the DOM is never modified
+    and CSS selectors still see the whole page.
+    """
+
+    def __init__(self, html: str, url: Optional[str] = None):
+        from bs4 import BeautifulSoup
+
+        self.html = html or ""
+        self.url = url
+        self.soup = BeautifulSoup(self.html, "lxml")
+        self._cleaned: Dict[str, str] = {}
+
+    @staticmethod
+    def _strings(root, skip) -> Iterator[str]:
+        from bs4 import CData, NavigableString, Tag
+
+        stack = [iter(root.children)]
+        while stack:
+            child = next(stack[-1], None)
+            if child is None:
+                stack.pop()
+            elif isinstance(child, Tag):
+                if child.name not in skip:
+                    stack.append(iter(child.children))
+            elif type(child) in (NavigableString, CData):
+                text = child.strip()
+                if text:
+                    yield text
+
+    def select(self, selector: str):
+        return self.soup.select(selector)
+
+    @cached_property
+    def text(self) -> str:
+        """All visible text of the page, one space between strings (used for regex extraction)."""
+        return " ".join(self._strings(self.soup, NON_TEXT_TAGS))
+
+    def cleaned_text(self, separator: str = " ") -> str:
+        """
+        Text for the LLM: the div.main-content block if there is one, else the body,
+        without header/footer/nav/aside/ads/scripts/styles.
+        """
+        if separator not in self._cleaned:
+            root = self.soup.find("div", class_="main-content") or self.soup.body or self.soup
+            self._cleaned[separator] = separator.join(self._strings(root, BOILERPLATE_TAGS | NON_TEXT_TAGS))
+        return self._cleaned[separator]
+
+    @cached_property
+    def links(self) -> Dict[str, List[Dict[str, str]]]:
+        """Absolute http(s) links, de-duplicated and split into internal/external by the page's host."""
+        base_domain = urlparse(self.url or "").netloc
+        internal, external, seen = [], [], set()
+        for anchor in self.soup.find_all("a", href=True):
+            href = urldefrag(urljoin(self.url or "", anchor["href"].strip()))[0]
+            if not href.startswith(("http://", "https://")) or href in seen:
+                continue
+            seen.add(href)
+            link = {"href": href, "text": anchor.get_text(strip=True)}
+            (internal if urlparse(href).netloc == base_domain else external).append(link)
+        return {"internal": internal, "external": external}
+
+    @cached_property
+    def rel_next(self) -> Optional[str]:
+        """Absolute URL of the page's rel="next" link (<link> in the head or an <a>), if any."""
+        for tag in self.soup.find_all(["link", "a"], href=True):
+            if "next" in [rel.lower() for rel in tag.get("rel") or []]:
+                return urldefrag(urljoin(self.url or "", tag["href"].strip()))[0]
+        return None
+
+    @cached_property
+    def metadata(self) -> Dict[str, Optional[str]]:
+        """Title, language, description, canonical URL and Open Graph properties."""
+        soup = self.soup
+        metadata: Dict[str, Optional[str]] = {
+            "title": soup.title.get_text(strip=True) if soup.title else None,
+            "lang": soup.html.get("lang") if soup.html else None,
+            "description": None,
+            "canonical": None,
+        }
+        for meta in soup.find_all("meta"):
+            name = (meta.get("name") or meta.get("property") or "").lower()
+            if name == "description":
+                metadata["description"] = meta.get("content")
+            elif name.startswith("og:"):
+                metadata[name] = meta.get("content")
+        canonical = soup.find("link", rel="canonical")
+        if canonical is not None and canonical.get("href"):
+            metadata["canonical"] = urljoin(self.url or "", canonical["href"])
+        return metadata
@@ -0,0 +1,403 @@
+# pipeline.py
+
+import asyncio
+from typing import Callable, Dict, List, Optional, Tuple
+
+from assets import (
+    DEFAULT_FETCH_PROFILE,
+    MAX_CONCURRENT_URLS,
+    PAGINATION_FOLLOW_MAX_PAGES,
+    PIPELINE_CLEAN_WORKERS,
+    PIPELINE_EXTRACT_WORKERS,
+    PIPELINE_QUEUE_SIZE,
+)
+from api_management import get_api_key, get_supabase_credentials, use_supabase_credentials
+from browser_pool import run_sync
+from chunking import build_chunks, merge_listings
+from markdown import fetch_and_store_one_async, iter_raw_pages
+from pagination import detect_pagination_async, pagination_data_buffer, save_pagination_data
+from scraper import (
+    combine_field_values,
+    create_dynamic_listing_model,
+    create_listings_container_model,
+    extract_listings_async,
+    extract_pages_manually,
+    formatted_data_buffer,
+    save_formatted_data,
+)
+from utils import generate_cache_key, normalize_url
+
+# Marks the end of a stage's input
+_DONE = object()
+
+
+async def _run_stage(name: str, work, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue], workers: int, on_failure=None) -> None:
+    """
+    Run `workers` copies of work(item) over the items of inbox and put what they return
+    on outbox. Putting waits while outbox is full, which is what holds this stage back
+    when the next one is slower. An item whose work fails is logged, passed to
+    on_failure(item, error) and dropped.
+    """
+    async def worker():
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                inbox.put_nowait(_DONE)  # so the stage's other workers stop too
+                return
+            try:
+                item = await work(item)
+            except Exception as e:
+                print(f"{name} failed for {item['url']}: {e}")
+                if on_failure is not None:
+                    on_failure(item, e)
+                continue
+            if item is not None and outbox is not None:
+                await outbox.put(item)
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    if outbox is not None:
+        await outbox.put(_DONE)
+
+
+def _page_urls(pagination_data) -> List[str]:
+    if hasattr(pagination_data, "model_dump"):
+        pagination_data = pagination_data.model_dump()
+    urls = pagination_data.get("page_urls") if isinstance(pagination_data, dict) else None
+    return [url for url in urls if isinstance(url, str)] if isinstance(urls, list) else []
+
+
+def _usage(results) -> Tuple[int, int, float]:
+    """(input_tokens, output_tokens, cost) summed over (parsed, token_counts, cost) results."""
+    input_tokens = output_tokens = 0
+    cost = 0
+    for result in results:
+        if result is not None:
+            input_tokens += result[1]["input_tokens"]
+            output_tokens += result[1]["output_tokens"]
+            cost += result[2]
+    return input_tokens, output_tokens, cost
+
+
+def _item_output(item: Dict[str, object], ai: bool, fields: List[str], followed: Optional[List[Dict[str, object]]] = None,
+                 container=None) -> Tuple[List[dict], List[dict], Tuple[int, int, float], Tuple[int, int, float]]:
+    """
+    (data entries, pagination entries, extraction usage, pagination detection usage) of one
+    finished crawl, each usage as (input_tokens, output_tokens, cost). The listings of its
+    followed pagination pages are merged into its own.
+    """
+    uniq = item["unique_name"]
+    crawls = [item] + (followed or [])
+    extraction_usage = _usage([crawl["result"] for crawl in crawls] if ai else [])
+    pagination_usage = _usage([crawl.get("pagination") for crawl in crawls])
+    if ai:
+        parsed = item["result"][0] if len(crawls) == 1 else merge_listings([crawl["result"][0] for crawl in crawls], container)
+        data = [{"unique_name": uniq, "parsed_data": parsed}]
+    else:
+        values = {field: [] for field in fields}
+        for crawl in crawls:
+            for field, field_values in crawl["result"].items():
+                values[field].extend(field_values)
+        data = combine_field_values(values, fields)
+    pagination = [] if item.get("pagination") is None else [{"unique_name": uniq, "pagination_data": item["pagination"][0]}]
+    return data, pagination, extraction_usage, pagination_usage
+
+
+async def run_pipeline_async(
+    urls: List[str],
+    fields: List[str],
+    depth,
+    max_url,
+    nextButton,
+    scrap_type: str = "ai",
+    selected_model: Optional[str] = None,
+    css_selectors: Optional[Dict[str, str]] = None,
+    force_refresh: bool = False,
+    profile: str = DEFAULT_FETCH_PROFILE,
+    paginate: bool = False,
+    indication: str = "",
+    api_key: Optional[str] = None,
+    on_result: Optional[Callable[[Dict[str, object]], None]] = None,
+    follow_pagination: bool = False,
+    max_pages: int = PAGINATION_FOLLOW_MAX_PAGES,
+):
+    """
+    Crawl, extract and store every URL as one staged pipeline:
+
+      fetch    crawl and store the URL's pages (or reuse a fresh stored crawl)
+      clean    read the stored pages back: token-budgeted chunks for "ai", raw HTML for "manual"
+      extract  LLM extraction ("ai") or CSS/regex extraction ("manual"), plus pagination
+               detection when paginate is set
+      persist  save formatted_data / pagination_data
+
+    Stages are joined by queues of PIPELINE_QUEUE_SIZE crawls, so one URL is being
+    extracted while the next is still rendering, and a slow stage pauses the ones
+    before it instead of piling up pages in memory. A URL that fails in any stage
+    is logged and left out.
+
+    The unit that moves between stages is a whole crawl, not a page: a URL is extracted
+    once all of its pages are stored, because its pages are packed into token-budgeted
+    chunks together and its listings are merged into one result. A single URL crawled
+    with depth/max_url therefore renders completely before extraction starts; the overlap
+    is between URLs (and followed pagination pages, which are crawls of their own).
+
+    With follow_pagination (which implies paginate), the page URLs detected for a URL go
+    straight back into the fetch stage, at most max_pages per URL counting the URL itself,
+    skipping pages already fetched in this run. Their listings are merged into the URL's
+    own (and saved to its formatted_data), so each URL still gives one result.
+
+    on_result, if given, is called on the crawl loop as each URL finishes, in completion
+    order, with {"url", "unique_name", "parent", "pages", "data", "pagination", "input_tokens",
+    "output_tokens", "cost", "pagination_input_tokens", "pagination_output_tokens",
+    "pagination_cost", "error"} (error is None unless a stage failed; parent is the
+    unique_name of the URL whose pagination led to this page, else None). It must
+    not block; pushing the record onto a queue.Queue is the intended use.
+
+    Return (unique_names, input_tokens, output_tokens, cost, data, pagination_results,
+    (pagination_input_tokens, pagination_output_tokens, pagination_cost)), data and
+    pagination_results in the order of urls, as scrape_urls / scrape_urls_manually and
+    paginate_urls return them. The first usage counts extraction only, the last one
+    pagination detection only.
+    """
+    ai = scrap_type == "ai"
+    paginate = paginate or follow_pagination
+    unique_names = [generate_cache_key(url, depth, max_url, nextButton) for url in urls]
+    container = create_listings_container_model(create_dynamic_listing_model(fields)) if ai else None
+    formatted_buffer = formatted_data_buffer() if ai else None
+    pagination_buffer = pagination_data_buffer() if paginate else None
+    results: Dict[str, Dict[str, object]] = {}
+    followed: Dict[str, List[Dict[str, object]]] = {}
+    # Normalized URLs fetched (or queued) in this run, so no page is fetched twice
+    seen = set()
+
+    # URLs to fetch, unbounded so extract can add followed pages without waiting on the
+    # fetch queue it is itself holding up; the input ends once nothing is in flight
+    frontier: asyncio.Queue = asyncio.Queue()
+    in_flight = 0
+
+    def enqueue(item):
+        nonlocal in_flight
+        in_flight += 1
+        seen.add(normalize_url(item["url"]))
+        frontier.put_nowait(item)
+
+    def finished(item):
+        nonlocal in_flight
+        in_flight -= 1
+        if in_flight == 0:
+            frontier.put_nowait(_DONE)
+
+    def report(item, error: Optional[str] = None):
+        if on_result is None:
+            return
+        record = {
+            "url": item["url"], "unique_name": item.get("unique_name"), "parent": item.get("parent"), "pages": item.get("page_count", 0),
+            "data": [], "pagination": [], "input_tokens": 0, "output_tokens": 0, "cost": 0,
+            "pagination_input_tokens": 0, "pagination_output_tokens": 0, "pagination_cost": 0, "error": error,
+        }
+        if error is None and "result" in item:
+            data, pagination, (input_tokens, output_tokens, cost), (input_p, output_p, cost_p) = _item_output(item, ai, fields)
+            record.update(data=data, pagination=pagination, input_tokens=input_tokens, output_tokens=output_tokens, cost=cost,
+                          pagination_input_tokens=input_p, pagination_output_tokens=output_p, pagination_cost=cost_p)
+        try:
+            on_result(record)
+        except Exception as e:
+            print(f"on_result failed for {item['url']}: {e}")
+
+    async def fetch(item):
+        # The crawl row is written right away: persist updates it. A followed page is
+        # crawled on its own (depth 0, one page)
+        crawl = (depth, max_url, nextButton) if item.get("parent") is None else (0, 1, None)
+        item["unique_name"], _ = await fetch_and_store_one_async(item["url"], *crawl, force_refresh, profile=profile)
+        return item
+
+    async def clean(item):
+        uniq = item["unique_name"]
+        item["page_count"] = 0
+
+        def stored_html():
+            for page in iter_raw_pages(uniq):
+                item["page_count"] += 1
+                if page.get("url"):
+                    seen.add(normalize_url(page["url"]))
+                yield page["html"]
+
+        if ai:
+            # Pages are cleaned one at a time, so a large crawl never sits in memory as one string
+            item["chunks"] = await asyncio.to_thread(lambda: build_chunks(stored_html(), selected_model))
+            has_pages = bool(item["chunks"])
+        else:
+            item["pages"] = await asyncio.to_thread(
+                lambda: [(page["html"], page.get("url")) for page in iter_raw_pages(uniq) if page.get("html")]
+            )
+            item["page_count"] = len(item["pages"])
+            seen.update(normalize_url(url) for _, url in item["pages"] if url)
+            has_pages = bool(item["pages"])
+        if not has_pages:
+            print(f"No raw_data found for {uniq}, skipping.")
+            report(item)
+            finished(item)
+            return None
+        return item
+
+    async def extract(item):
+        uniq = item["unique_name"]
+        if ai:
+            extraction = extract_listings_async(uniq, item.pop("chunks"), container, selected_model, api_key)
+        else:
+            extraction = asyncio.to_thread(extract_pages_manually, item.pop("pages"), fields, css_selectors)
+        if not paginate or item.get("parent") is not None:
+            item["result"] = await extraction
+            return item
+        result, pagination = await asyncio.gather(
+            extraction, detect_pagination_async(uniq, item["url"], selected_model, indication, api_key),
+            return_exceptions=True,
+        )
+        if isinstance(result, BaseException):
+            raise result
+        if isinstance(pagination, BaseException):
+            print(f"Pagination detection failed for {uniq}: {pagination}")
+            pagination = None
+        item["result"], item["pagination"] = result, pagination
+        if follow_pagination and pagination is not None:
+            follow(item, _page_urls(pagination[0]))
+        return item
+
+    def follow(item, page_urls: List[str]):
+        budget = max_pages - 1  # the URL itself is the first page
+        queued = 0
+        for page_url in page_urls:
+            if queued >= budget:
+                break
+            if normalize_url(page_url) in seen:
+                continue
+            enqueue({"url": page_url, "parent": item["unique_name"]})
+            queued += 1
+        item["following"] = queued
+        if queued:
+            print(f"Following {queued} pagination pages of {item['unique_name']}")
+
+    async def persist(item):
+        uniq = item["unique_name"]
+        # A URL with followed pages is saved once, with their listings, when the run ends;
+        # saving it here too would put its row in the same bulk upsert twice
+        if ai and not item.get("following"):
+            await asyncio.to_thread(save_formatted_data, uniq, item["result"][0], formatted_buffer)
+        if item.get("pagination") is not None:
+            await asyncio.to_thread(save_pagination_data, uniq, item["pagination"][0], pagination_buffer)
+        if item.get("parent") is None:
+            results[uniq] = item
+        else:
+            followed.setdefault(item["parent"], []).append(item)
+        report(item)
+        finished(item)
+
+    queues = [asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE) for _ in range(4)]
+    stages = [
+        ("Fetch", fetch, MAX_CONCURRENT_URLS),
+        ("Clean", clean, PIPELINE_CLEAN_WORKERS),
+        ("Extract", extract, PIPELINE_EXTRACT_WORKERS),
+        ("Persist", persist, 1),
+    ]
+
+    async def feed():
+        while True:
+            item = await frontier.get()
+            await queues[0].put(item)
+            if item is _DONE:
+                return
+
+    def failed(item, error, stage):
+        report(item, f"{stage} failed: {error}")
+        finished(item)
+
+    # The same URL submitted twice is only crawled once
+    first_urls: Dict[str, str] = {}
+    for url, uniq in zip(urls, unique_names):
+        first_urls.setdefault(uniq, url)
+    for url in first_urls.values():
+        enqueue({"url": url, "parent": None})
+    if not first_urls:
+        frontier.put_nowait(_DONE)
+
+    total_input_tokens = 0
+    total_output_tokens = 0
+    total_cost = 0
+    pagination_usage = [0, 0, 0]
+    data = []
+    pagination_results = []
+    try:
+        await asyncio.gather(
+            feed(),
+            *(
+                _run_stage(
+                    name, work, queues[index], queues[index + 1] if index + 1 < len(queues) else None, workers,
+                    lambda item, error, name=name: failed(item, error, name),
+                )
+                for index, (name, work, workers) in enumerate(stages)
+            ),
+        )
+
+        for uniq in unique_names:
+            item = results.get(uniq)
+            if item is None:
+                continue
+            item_data, item_pagination, (input_tokens, output_tokens, cost), item_pagination_usage = _item_output(
+                item, ai, fields, followed.get(uniq), container
+            )
+            data.extend(item_data)
+            pagination_results.extend(item_pagination)
+            # A URL submitted twice appears twice in the results, but was only paid for once
+            if not item.get("counted"):
+                item["counted"] = True
+                total_input_tokens += input_tokens
+                total_output_tokens += output_tokens
+                total_cost += cost
+                pagination_usage = [total + used for total, used in zip(pagination_usage, item_pagination_usage)]
+                if ai and item.get("following"):
+                    # The URL's row holds the listings of all its pages
+                    await asyncio.to_thread(save_formatted_data, uniq, item_data[0]["parsed_data"], formatted_buffer)
+    finally:
+        for buffer in (formatted_buffer, pagination_buffer):
+            if buffer is not None:
+                for row, error in await asyncio.to_thread(buffer.close):
+                    print(f"Could not save {buffer.name} for {row['unique_name']}: {error}")
+
+    return unique_names, total_input_tokens, total_output_tokens, total_cost, data, pagination_results, tuple(pagination_usage)
+
+
+def run_pipeline(urls: List[str], fields: List[str], depth, max_url, nextButton, scrap_type: str = "ai",
+                 selected_model: Optional[str] = None, css_selectors: Optional[Dict[str, str]] = None,
+                 force_refresh: bool = False, profile: str = DEFAULT_FETCH_PROFILE, paginate: bool = False,
+                 indication: str = "", on_result: Optional[Callable[[Dict[str, object]], None]] = None,
+                 follow_pagination: bool = False, max_pages: int = PAGINATION_FOLLOW_MAX_PAGES):
+    """
+    Blocking wrapper around run_pipeline_async(), run on the shared crawl loop.
+    """
+    return run_sync(pipeline_job(
+        urls, fields, depth, max_url, nextButton, scrap_type, selected_model, css_selectors,
+        force_refresh, profile, paginate, indication, on_result, follow_pagination, max_pages,
+    ))
+
+
+def pipeline_job(urls: List[str], fields: List[str], depth, max_url, nextButton, scrap_type: str = "ai",
+                 selected_model: Optional[str] = None, css_selectors: Optional[Dict[str, str]] = None,
+                 force_refresh: bool = False, profile: str = DEFAULT_FETCH_PROFILE, paginate: bool = False,
+                 indication: str = "", on_result: Optional[Callable[[Dict[str, object]], None]] = None,
+                 follow_pagination: bool = False, max_pages: int = PAGINATION_FOLLOW_MAX_PAGES):
+    """
+    The run_pipeline_async() coroutine, with the API key and the Supabase credentials looked
+    up in the calling thread. Pass it to browser_pool.submit() to run the pipeline without waiting for it.
+    """
+    # Looked up here: the crawl loop's thread has no Streamlit session to read keys from
+    api_key = get_api_key(selected_model) if scrap_type == "ai" or paginate or follow_pagination else None
+    credentials = get_supabase_credentials()
+    return _with_supabase_credentials(credentials, run_pipeline_async(
+        urls, fields, depth, max_url, nextButton, scrap_type, selected_model, css_selectors,
+        force_refresh, profile, paginate, indication, api_key, on_result, follow_pagination, max_pages,
+    ))
+
+
+async def _with_supabase_credentials(credentials, coro):
+    """Run coro with storage going to the Supabase project of credentials (the job's own, not the process's)."""
+    use_supabase_credentials(credentials)
+    return await coro
@@ -0,0 +1,57 @@
+# raw_codec.py
+
+import base64
+import gzip
+from typing import Optional, Tuple
+
+from assets import RAW_DATA_CODEC, RAW_DATA_COMPRESSION_LEVEL
+
+try:
+    import zstandard
+except ImportError:  # optional dependency, gzip is used instead
+    zstandard = None
+
+CODECS = ("zstd", "gzip", "none")
+
+
+def resolve_codec(codec: Optional[str] = None) -> str:
+    """The codec to write with: the requested one, or gzip if zstandard isn't installed."""
+    codec = (codec or RAW_DATA_CODEC or "none").lower()
+    if codec not in CODECS:
+        raise ValueError(f"Unknown raw data codec {codec!r}, expected one of {CODECS}")
+    if codec == "zstd" and zstandard is None:
+        print("zstandard is not installed, compressing raw data with gzip instead")
+        return "gzip"
+    return codec
+
+
+def encode_raw(text: Optional[str], codec: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Compress text for storage. Returns (stored value, codec name to record with the row).
+    Compressed bytes are base64 encoded so they fit the existing TEXT/JSONB columns.
+    """
+    if text is None:
+        return None, None
+    codec = resolve_codec(codec)
+    if codec == "none":
+        return text, None
+    raw = text.encode("utf-8")
+    if codec == "zstd":
+        packed = zstandard.ZstdCompressor(level=RAW_DATA_COMPRESSION_LEVEL).compress(raw)
+    else:
+        packed = gzip.compress(raw, compresslevel=min(RAW_DATA_COMPRESSION_LEVEL, 9))
+    return base64.b64encode(packed).decode("ascii"), codec
+
+
+def decode_raw(stored: Optional[str], codec: Optional[str]) -> Optional[str]:
+    """Inverse of encode_raw(); rows without a codec are returned as they are."""
+    if stored is None or not codec or codec == "none":
+        return stored
+    packed = base64.b64decode(stored)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This row is zstd compressed; install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(packed).decode("utf-8")
+    if codec == "gzip":
+        return gzip.decompress(packed).decode("utf-8")
+    raise ValueError(f"Unknown raw data codec {codec!r}")
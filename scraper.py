@@ -1,17 +1,20 @@
 # scraper.py
 
+import asyncio
 import json
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel, create_model
-from assets import (OPENAI_MODEL_FULLNAME,GEMINI_MODEL_FULLNAME,SYSTEM_MESSAGE)
-from llm_calls import (call_llm_model,clean_html_from_string)
-from markdown import read_raw_data
-from api_management import get_supabase_client
+from assets import (OPENAI_MODEL_FULLNAME,GEMINI_MODEL_FULLNAME,SYSTEM_MESSAGE,MANUAL_EXTRACT_WORKERS,MANUAL_EXTRACT_CHUNKSIZE)
+from llm_calls import (acall_llm_model,clean_html_from_string,merge_token_counts)
+from api_management import get_api_key
+from browser_pool import run_sync
+from chunking import build_chunks, merge_listings
+from parsed_page import ParsedPage
+from markdown import iter_raw_pages
+from storage import get_storage
+from write_buffer import WriteBuffer
 from utils import  generate_unique_name
-import re
 
-from bs4 import BeautifulSoup
-supabase = get_supabase_client()
 
 def create_dynamic_listing_model(field_names: List[str]):
     field_definitions = {field: (str, ...) for field in field_names}
@@ -43,7 +46,13 @@ def generate_system_message(listing_model: BaseModel) -> str:
     return final_prompt
 
 
-def save_formatted_data(unique_name: str, formatted_data):
+def formatted_data_buffer() -> WriteBuffer:
+    """Buffer for {"unique_name", "formatted_data"} rows, written with bulk updates."""
+    storage = get_storage()
+    return WriteBuffer(storage.update_scraped_rows, lambda row: storage.update_scraped_rows([row]), "formatted_data")
+
+
+def save_formatted_data(unique_name: str, formatted_data, buffer: Optional[WriteBuffer] = None):
     if isinstance(formatted_data, str):
         try:
             data_json = json.loads(formatted_data)
@@ -54,20 +63,23 @@ def save_formatted_data(unique_name: str, formatted_data):
     else:
         data_json = formatted_data
 
-    supabase.table("scraped_data").update({
-        "formatted_data": data_json
-    }).eq("unique_name", unique_name).execute()
+    if buffer is not None:
+        buffer.add({"unique_name": unique_name, "formatted_data": data_json})
+        return
+    get_storage().save_formatted_data(unique_name, data_json)
     MAGENTA = "\033[35m"
     RESET = "\033[0m"  # Reset color to default
     print(f"{MAGENTA}INFO:Scraped data saved for {unique_name}{RESET}")
 
-def scrape_urls(unique_names: List[str], fields: List[str], selected_model: str):
+async def scrape_urls_async(unique_names: List[str], fields: List[str], selected_model: str, api_key: Optional[str] = None):
     """
-    For each unique_name:
-      1) read raw_data from supabase
-      2) parse with selected LLM
+    For each unique_name, concurrently:
+      1) read the stored pages and split their text into token-budgeted chunks
+      2) parse every chunk with selected LLM (acall_llm_model, limited per provider)
+         and merge the listings of all chunks, without duplicates
       3) save formatted_data
-      4) accumulate cost
+    Then accumulate cost. Results keep the order of unique_names; a page whose
+    extraction fails is logged and left out without affecting the others.
     Return total usage + list of final parsed data
     """
     total_input_tokens = 0
@@ -77,91 +89,135 @@ def scrape_urls(unique_names: List[str], fields: List[str], selected_model: str)
 
     DynamicListingModel = create_dynamic_listing_model(fields)
     DynamicListingsContainer = create_listings_container_model(DynamicListingModel)
+    buffer = formatted_data_buffer()
+    print("Selected Model",selected_model,"System Message is ",SYSTEM_MESSAGE)
 
-    for uniq in unique_names:
-        raw_data = read_raw_data(uniq)
-        if not raw_data:
+    async def extract(uniq):
+        # Pages are cleaned one at a time, so a large crawl never sits in memory as one string
+        chunks = await asyncio.to_thread(lambda: build_chunks((page["html"] for page in iter_raw_pages(uniq)), selected_model))
+        if not chunks:
             BLUE = "\033[34m"
             RESET = "\033[0m"
             print(f"{BLUE}No raw_data found for {uniq}, skipping.{RESET}")
-            continue
-        print("Selected Model",selected_model,"System Message is ",SYSTEM_MESSAGE)
-        parsed, token_counts, cost = call_llm_model(raw_data, DynamicListingsContainer, selected_model, SYSTEM_MESSAGE)
-
+            return None
+        result = await extract_listings_async(uniq, chunks, DynamicListingsContainer, selected_model, api_key)
         # store
-        save_formatted_data(uniq, parsed)
+        await asyncio.to_thread(save_formatted_data, uniq, result[0], buffer)
+        return result
+
+    results = await asyncio.gather(*(extract(uniq) for uniq in unique_names), return_exceptions=True)
 
+    for uniq, result in zip(unique_names, results):
+        if isinstance(result, BaseException):
+            print(f"Extraction failed for {uniq}: {result}")
+            continue
+        if result is None:
+            continue
+        parsed, token_counts, cost = result
         total_input_tokens += token_counts["input_tokens"]
         total_output_tokens += token_counts["output_tokens"]
         total_cost += cost
         parsed_results.append({"unique_name": uniq,"parsed_data": parsed})
 
+    failed = await asyncio.to_thread(buffer.close)
+    MAGENTA = "\033[35m"
+    RESET = "\033[0m"
+    print(f"{MAGENTA}INFO:Scraped data saved for {buffer.written} of {buffer.written + len(failed)} pages{RESET}")
     return total_input_tokens, total_output_tokens, total_cost, parsed_results
 
 
-import re
-import json
-from bs4 import BeautifulSoup
-from typing import List, Dict, Optional
-
-# Predefined regex patterns
-regex_patterns = {
-    'email': r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}',
-    'mobile number': r'(\+?\d{1,4}[\s.-]?)?(\(?\d{1,4}\)?[\s.-]?)?[\d\s.-]{7,15}',
-    'dob': r'(0[1-9]|1[0-9]|2[0-9]|3[01])[-/](0[1-9]|1[0-2])[-/](19|20)\d\d',
-    'name': r'\b([A-Z][a-z]+(?:\s[A-Z][a-z]+)*)\b',
-    'password': r'(?i)(?=.*[A-Z])(?=.*[a-z])(?=.*\d)(?=.*[!@#$%^&*()_+])[A-Za-z\d!@#$%^&*()_+]{8,}',
-}
-
-from typing import List, Dict, Optional
-from bs4 import BeautifulSoup
-import re
+async def extract_listings_async(uniq: str, chunks: List[str], container, selected_model: str, api_key: Optional[str] = None):
+    """
+    Extract the listings of one crawl from its chunks (see chunking.build_chunks).
+    Return (parsed_data, token_counts, cost).
+    """
+    if len(chunks) == 1:
+        return await acall_llm_model(chunks[0], container, selected_model, SYSTEM_MESSAGE, api_key=api_key, clean=False)
+    print(f"{uniq} is split into {len(chunks)} chunks")
+    return await _extract_chunks(uniq, chunks, container, selected_model, api_key)
 
-def extract_data_from_html(
-    html_content: str,
+
+async def _extract_chunks(uniq: str, chunks: List[str], container, selected_model: str, api_key: Optional[str]):
+    """Extract every chunk in parallel and merge the listings. A failed chunk is skipped unless all fail."""
+    results = await asyncio.gather(
+        *(acall_llm_model(chunk, container, selected_model, SYSTEM_MESSAGE, api_key=api_key, clean=False) for chunk in chunks),
+        return_exceptions=True,
+    )
+    succeeded = [result for result in results if not isinstance(result, BaseException)]
+    for index, result in enumerate(results):
+        if isinstance(result, BaseException):
+            print(f"Chunk {index + 1}/{len(chunks)} of {uniq} failed: {result}")
+    if not succeeded:
+        raise results[0]
+
+    parsed = merge_listings([result[0] for result in succeeded], container)
+    token_counts = merge_token_counts([result[1] for result in succeeded])
+    return parsed, token_counts, sum(result[2] for result in succeeded)
+
+
+def scrape_urls(unique_names: List[str], fields: List[str], selected_model: str):
+    """
+    Blocking wrapper around scrape_urls_async(), run on the shared crawl loop.
+    Return total usage + list of final parsed data
+    """
+    # Looked up here: the crawl loop's thread has no Streamlit session to read keys from
+    api_key = get_api_key(selected_model)
+    return run_sync(scrape_urls_async(unique_names, fields, selected_model, api_key))
+
+
+import os
+from collections import deque
+from itertools import islice
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple, Union
+from contact_extractor import extract_fields
+
+def extract_field_values(
+    html_content: Union[str, ParsedPage],
     fields: List[str],
     css_selectors: Optional[Dict[str, str]] = None
-) -> List[Dict[str, object]]:
+) -> Dict[str, List[str]]:
     """
-    Extracts data from HTML content using CSS selectors and regex fallbacks, returning a structured list of data.
+    Extracts the values of each field from one HTML page (or its ParsedPage) using
+    CSS selectors and regex fallbacks.
     """
-    soup = BeautifulSoup(html_content, 'html.parser')
+    page = html_content if isinstance(html_content, ParsedPage) else ParsedPage(html_content)
     extracted_data: Dict[str, List[str]] = {}
     
-    # Predefined regex patterns for common fields
-    default_regex = {
-        'email': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
-        'mobile number': r'(\+?\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}',
-        'phone': r'(\+?\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}',
-        'dob': r'\b\d{1,2}[\/-]\d{1,2}[\/-]\d{2,4}\b',
-        'date of birth': r'\b\d{1,2}[\/-]\d{1,2}[\/-]\d{2,4}\b',
-        'name': r'(?i)\b[A-Z][a-z]+(?: [A-Z][a-z]+)+\b'  # Basic name pattern
-    }
-    
+    # Fields without a CSS selector share one scan of the page text
+    regex_values = extract_fields(
+        page.text,
+        [field for field in fields if not (css_selectors and field in css_selectors)]
+    )
+
     for field in fields:
         values = []
         if css_selectors and field in css_selectors:
             # Extract using CSS selector
-            elements = soup.select(css_selectors[field])
+            elements = page.select(css_selectors[field])
             values = [
                 element.get_text(strip=True)
                 for element in elements
                 if element.get_text(strip=True)
             ]
         else:
-            # Attempt regex extraction based on field name
-            regex_key = next(
-                (key for key in default_regex.keys() if key.lower() == field.lower()),
-                None
-            )
-            if regex_key:
-                text = soup.get_text()
-                matches = re.findall(default_regex[regex_key], text, flags=re.IGNORECASE)
-                values = [match.strip() for match in matches if match.strip()]
+            # Regex extraction based on field name (email, phone, dob, name)
+            values = regex_values.get(field, [])
         
-        # Ensure at least one entry (empty string if no data)
-        extracted_data[field] = values if values else [""]
+        extracted_data[field] = values
     
+    return extracted_data
+
+
+def combine_field_values(
+    extracted_data: Dict[str, List[str]],
+    fields: List[str]
+) -> List[Dict[str, object]]:
+    """
+    Zips per-field value lists into rows and wraps them in the structure the UI expects.
+    """
+    # Ensure at least one entry (empty string if no data)
+    extracted_data = {field: extracted_data.get(field) or [""] for field in fields}
+
     # Determine max number of rows
     max_rows = max(len(v) for v in extracted_data.values()) if extracted_data else 0
     
@@ -181,30 +237,115 @@ def extract_data_from_html(
     
     return final_data
 
+
+def extract_data_from_html(
+    html_content: str,
+    fields: List[str],
+    css_selectors: Optional[Dict[str, str]] = None
+) -> List[Dict[str, object]]:
+    """
+    Extracts data from HTML content using CSS selectors and regex fallbacks, returning a structured list of data.
+    """
+    return combine_field_values(extract_field_values(html_content, fields, css_selectors), fields)
+
+def extract_pages_manually(
+    pages: Iterable[Tuple[str, Optional[str]]],
+    fields: List[str],
+    css_selectors: Optional[Dict[str, str]] = None
+) -> Dict[str, List[str]]:
+    """The field values of every (html, url) page of one crawl, merged in page order."""
+    values: Dict[str, List[str]] = {field: [] for field in fields}
+    for html, url in pages:
+        for field, page_values in extract_field_values(ParsedPage(html, url), fields, css_selectors).items():
+            values[field].extend(page_values)
+    return values
+
+
+def _extract_page_batch(
+    batch: List[Tuple[str, Optional[str]]],
+    fields: List[str],
+    css_selectors: Optional[Dict[str, str]]
+) -> List[Dict[str, List[str]]]:
+    """Process-pool task: the field values of each (html, url) page in the batch."""
+    return [extract_field_values(ParsedPage(html, url), fields, css_selectors) for html, url in batch]
+
+
+def _iter_stored_pages(unique_names: List[str]) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """(unique_name, html, url) of every stored page that has HTML, streamed in order."""
+    for uniq in unique_names:
+        for page in iter_raw_pages(uniq):
+            if page.get("html"):
+                yield uniq, page["html"], page.get("url")
+
+
+def _extract_in_pool(
+    pages: Iterator[Tuple[str, str, Optional[str]]],
+    fields: List[str],
+    css_selectors: Optional[Dict[str, str]],
+    workers: int,
+    chunksize: int
+) -> Iterator[Tuple[str, Dict[str, List[str]]]]:
+    """
+    Yields (unique_name, field values) per page, in input order, with the parsing done
+    by a pool of worker processes. Pages are sent in batches of `chunksize` and at most
+    two batches per worker are in flight, so only that many pages are held in memory.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            batch = list(islice(pages, chunksize))
+            if batch:
+                future = pool.submit(_extract_page_batch, [(html, url) for _, html, url in batch], fields, css_selectors)
+                pending.append(([uniq for uniq, _, _ in batch], future))
+            if pending and (not batch or len(pending) >= 2 * workers):
+                names, future = pending.popleft()
+                yield from zip(names, future.result())
+            elif not batch:
+                break
+
+
 def scrape_urls_manually(
     unique_names: List[str], 
     fields: List[str], 
-    css_selectors: Optional[Dict[str, str]] = None
+    css_selectors: Optional[Dict[str, str]] = None,
+    workers: Optional[int] = MANUAL_EXTRACT_WORKERS,
+    chunksize: int = MANUAL_EXTRACT_CHUNKSIZE
 ) -> List[Dict[str, object]]:
     """
     Scrapes and extracts data manually from stored HTML content.
+    Each stored page is parsed on its own and the values are merged per unique_name.
 
     :param unique_names: List of unique identifiers for stored HTML.
     :param fields: List of fields to extract.
     :param css_selectors: Dictionary mapping fields to CSS selectors.
+    :param workers: Parse pages in a process pool of this many workers (None = one per CPU core);
+                    1 parses them in the calling thread.
+    :param chunksize: Pages sent to a worker per task.
     :return: A combined list of extracted data.
     """
+    workers = workers or os.cpu_count() or 1
+    pages = _iter_stored_pages(list(dict.fromkeys(unique_names)))  # Stored pages, streamed one at a time
+    if workers > 1:
+        results = _extract_in_pool(pages, fields, css_selectors, workers, max(1, chunksize))
+    else:
+        results = (
+            (uniq, extract_field_values(ParsedPage(html, url), fields, css_selectors))
+            for uniq, html, url in pages
+        )
+
+    values: Dict[str, Dict[str, List[str]]] = {}
+    for uniq, page_values in results:
+        merged = values.setdefault(uniq, {field: [] for field in fields})
+        for field, field_values in page_values.items():
+            merged[field].extend(field_values)
+
     complete_data = []
-    
     for uniq in unique_names:
-        raw_data = read_raw_data(uniq)  # Function to read raw HTML data
-        if not raw_data:
+        if uniq not in values:
             print(f"Skipping {uniq}, no raw data found.")
             continue
-
-        # Extract data
-        # raw_data= clean_html_from_string(raw_data)
-        data = extract_data_from_html(raw_data, fields, css_selectors)
-        complete_data.extend(data)  
+        complete_data.extend(combine_field_values(values[uniq], fields))
 
     return complete_data  # Fixed return statement
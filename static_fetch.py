@@ -0,0 +1,158 @@
+# static_fetch.py
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+from assets import (
+    STATIC_FAST_PATH,
+    STATIC_FETCH_TIMEOUT,
+    STATIC_MIN_TEXT_CHARS,
+    STATIC_PROBE_MIN_RATIO,
+    SPA_MARKERS,
+)
+from parsed_page import ParsedPage
+
+
+class StaticResult:
+    """
+    Result of a plain HTTP fetch, shaped like crawl4ai's CrawlResult
+    (success, html, links, response_headers, status_code) so callers can use either.
+    """
+
+    def __init__(self, url: str, success: bool, html: str = "", links: Optional[Dict[str, List[Dict[str, str]]]] = None,
+                 response_headers: Optional[Dict[str, str]] = None, status_code: Optional[int] = None,
+                 text_length: int = 0, error_message: str = ""):
+        self.url = url
+        self.success = success
+        self.html = html
+        self.links = links or {"internal": [], "external": []}
+        self.response_headers = response_headers or {}
+        self.status_code = status_code
+        self.text_length = text_length
+        self.error_message = error_message
+
+
+# One client per event loop (the crawl loop, apply.URLCrawler's loops), created lazily so
+# connections are kept alive between pages. A client can only be used on the loop it was made on.
+_clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+# Per-domain decision: "static" or "render". Decided once per process by a rendered probe.
+_domain_modes: Dict[str, str] = {}
+# Probe locks, per event loop like the clients: (loop, domain) -> lock
+_domain_probes: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Lock] = {}
+
+
+def _forget_closed_loops() -> None:
+    """Drop the clients and probe locks of loops that have been closed (their connections died with them)."""
+    for loop in [loop for loop in _clients if loop.is_closed()]:
+        del _clients[loop]
+    for key in [key for key in _domain_probes if key[0].is_closed()]:
+        del _domain_probes[key]
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """The HTTP client of the running event loop. Must be called from a coroutine."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        _forget_closed_loops()
+        client = _clients[loop] = httpx.AsyncClient(
+            timeout=STATIC_FETCH_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+        )
+    return client
+
+
+def _parse_page(url: str, html: str):
+    """Return (visible text length, links split into internal/external)."""
+    page = ParsedPage(html, url)
+    return len(page.text), page.links
+
+
+async def fetch_static(url: str, user_agent: Optional[str] = None) -> StaticResult:
+    headers = {"User-Agent": user_agent} if user_agent else {}
+    try:
+        response = await get_http_client().get(url, headers=headers)
+    except Exception as e:
+        return StaticResult(url, False, error_message=str(e))
+
+    content_type = response.headers.get("content-type", "")
+    if response.status_code != 200 or ("html" not in content_type and "xml" not in content_type):
+        return StaticResult(url, False, status_code=response.status_code,
+                            response_headers=dict(response.headers),
+                            error_message=f"status {response.status_code}, content-type {content_type!r}")
+
+    html = response.text
+    # BeautifulSoup is CPU bound, keep it off the event loop
+    text_length, links = await asyncio.to_thread(_parse_page, str(response.url), html)
+    return StaticResult(url, True, html, links, dict(response.headers), response.status_code, text_length)
+
+
+def is_js_app_shell(result: StaticResult) -> bool:
+    """A 200 response with an empty body or an empty client-side app mount point: the site renders with JS."""
+    if not result.success:
+        return False
+    lowered = result.html.lower()
+    return not lowered.strip() or any(marker in lowered for marker in SPA_MARKERS)
+
+
+def needs_js_rendering(result: StaticResult) -> bool:
+    """Cheap checks that a static response is missing content a browser would render."""
+    if not result.success or is_js_app_shell(result):
+        return True
+    return result.text_length < STATIC_MIN_TEXT_CHARS
+
+
+async def fetch_page(url: str, render: Callable[[str], Awaitable[object]], force_render: bool = False,
+                     user_agent: Optional[str] = None):
+    """
+    Fetch url with a plain HTTP GET when its domain is known to serve complete HTML,
+    falling back to render(url) (a headless-browser fetch) otherwise.
+
+    The first page of each domain is fetched both ways and the decision is cached:
+    if the static page has at least STATIC_PROBE_MIN_RATIO of the rendered text,
+    later pages of that domain skip the browser. An app shell (see is_js_app_shell)
+    decides "render" without a probe. A failed request or a page with little text is
+    rendered on its own and decides nothing for the domain.
+    """
+    if force_render or not STATIC_FAST_PATH:
+        return await render(url)
+
+    domain = urlparse(url).netloc
+    if _domain_modes.get(domain) == "render":
+        return await render(url)
+
+    static = await fetch_static(url, user_agent)
+    if is_js_app_shell(static):
+        if domain not in _domain_modes:
+            print(f"Static fetch of {url} is an empty app shell, rendering {domain} from now on")
+            _domain_modes[domain] = "render"
+        return await render(url)
+    if needs_js_rendering(static):
+        # A timeout, an error status or a short page says nothing about the rest of the domain
+        return await render(url)
+
+    if _domain_modes.get(domain) == "static":
+        return static
+
+    # One rendered probe per domain; concurrent pages of the same domain wait for it
+    lock = _domain_probes.setdefault((asyncio.get_running_loop(), domain), asyncio.Lock())
+    async with lock:
+        if domain in _domain_modes:
+            return static if _domain_modes[domain] == "static" else await render(url)
+        rendered = await render(url)
+        if not getattr(rendered, "success", False):
+            return rendered
+        rendered_length, _ = await asyncio.to_thread(_parse_page, url, rendered.html)
+        ratio = static.text_length / rendered_length if rendered_length else 1.0
+        _domain_modes[domain] = "static" if ratio >= STATIC_PROBE_MIN_RATIO else "render"
+        print(f"Fetch mode for {domain}: {_domain_modes[domain]} (static/rendered text ratio {ratio:.2f})")
+        return rendered
+
+
+def domain_fetch_modes() -> Dict[str, str]:
+    return dict(_domain_modes)
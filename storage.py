@@ -0,0 +1,483 @@
+# storage.py
+
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from api_management import current_supabase_credentials, get_supabase_client
+from assets import STORAGE_BACKEND, SQLITE_DB_PATH
+
+
+class StorageBackend(ABC):
+    """
+    Everything the scraper persists: crawled pages ('scraped_pages'), one row per
+    crawl with its formatted and pagination data ('scraped_data'), cron jobs ('cron'),
+    and the progress of unfinished crawls ('crawl_checkpoints').
+    Rows are plain dicts with the same column names in every backend.
+    """
+
+    # --- raw pages ---
+    @abstractmethod
+    def read_pages(self, unique_name: str, start: int, limit: int,
+                   index_range: Optional[Tuple[int, int]] = None) -> List[dict]:
+        """
+        Pages of a crawl ordered by page_index, rows start .. start + limit - 1.
+        index_range=(first, end) only counts pages with first <= page_index < end.
+        """
+
+    @abstractmethod
+    def save_page(self, row: dict) -> None:
+        """Insert or replace one page, keyed by (unique_name, page_index)."""
+
+    def save_pages(self, rows: List[dict]) -> None:
+        """Bulk save_page(); backends override this with a single write."""
+        for row in rows:
+            self.save_page(row)
+
+    @abstractmethod
+    def delete_pages(self, unique_name: str, start: int = 0, end: Optional[int] = None) -> None:
+        """Delete the pages of a crawl with start <= page_index < end (all of them by default)."""
+
+    @abstractmethod
+    def last_page_index(self, unique_name: str) -> Optional[int]:
+        """The highest page_index stored for a crawl, or None if it has no pages."""
+
+    # --- crawl rows, formatted data and pagination data ---
+    @abstractmethod
+    def read_scraped_row(self, unique_name: str, columns: Sequence[str]) -> dict:
+        """The requested columns of the 'scraped_data' row, or {} if there is none."""
+
+    @abstractmethod
+    def save_scraped_row(self, row: dict) -> None:
+        """Insert a 'scraped_data' row or update the given columns of the existing one."""
+
+    def save_scraped_rows(self, rows: List[dict]) -> None:
+        for row in rows:
+            self.save_scraped_row(row)
+
+    @abstractmethod
+    def update_scraped_row(self, unique_name: str, values: dict) -> None:
+        """Update columns of an existing 'scraped_data' row; missing rows are left alone."""
+
+    def update_scraped_rows(self, rows: List[dict]) -> None:
+        """Bulk update_scraped_row(); each row holds 'unique_name' plus the columns to set."""
+        for row in rows:
+            values = dict(row)
+            self.update_scraped_row(values.pop("unique_name"), values)
+
+    def save_formatted_data(self, unique_name: str, formatted_data) -> None:
+        self.update_scraped_row(unique_name, {"formatted_data": formatted_data})
+
+    def save_pagination_data(self, unique_name: str, pagination_data) -> None:
+        self.update_scraped_row(unique_name, {"pagination_data": pagination_data})
+
+    # --- cron jobs ---
+    @abstractmethod
+    def create_cron(self, data: dict) -> List[dict]:
+        """Insert a cron job and return the stored row(s)."""
+
+    @abstractmethod
+    def list_crons(self, columns: Sequence[str]) -> List[dict]:
+        ...
+
+    @abstractmethod
+    def update_cron(self, cron_id, values: dict) -> None:
+        ...
+
+    # --- crawl checkpoints ---
+    @abstractmethod
+    def read_checkpoint(self, job_id: str) -> dict:
+        """The 'crawl_checkpoints' row of a crawl job, or {} if there is none."""
+
+    @abstractmethod
+    def save_checkpoint(self, row: dict) -> None:
+        """Insert or replace a checkpoint, keyed by job_id."""
+
+    @abstractmethod
+    def delete_checkpoint(self, job_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def list_checkpoints(self, columns: Sequence[str]) -> List[dict]:
+        ...
+
+
+def _group_by_columns(rows: List[dict]) -> List[List[dict]]:
+    """Split rows into groups with identical keys (a bulk upsert needs one column set)."""
+    groups: Dict[tuple, List[dict]] = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    return list(groups.values())
+
+
+class SupabaseStorage(StorageBackend):
+    """
+    The tables described in the README, in a Supabase project, reached with the
+    (url, key) credentials it was created with. The client is looked up on every call
+    (get_supabase_client() caches one per credentials).
+    """
+
+    def __init__(self, credentials: Tuple[str, str]):
+        self.credentials = credentials
+
+    @property
+    def client(self):
+        client = get_supabase_client(self.credentials)
+        if client is None:
+            raise RuntimeError("Supabase is not configured (SUPABASE_URL / SUPABASE_ANON_KEY)")
+        return client
+
+    def _bulk_upsert(self, table: str, rows: List[dict], on_conflict: str) -> None:
+        for group in _group_by_columns(rows):
+            self.client.table(table).upsert(group, on_conflict=on_conflict).execute()
+
+    def read_pages(self, unique_name, start, limit, index_range=None):
+        query = (
+            self.client.table("scraped_pages")
+            .select("page_index", "url", "depth", "status", "html", "codec", "fetched_at")
+            .eq("unique_name", unique_name)
+        )
+        if index_range is not None:
+            query = query.gte("page_index", index_range[0]).lt("page_index", index_range[1])
+        response = query.order("page_index").range(start, start + limit - 1).execute()
+        return response.data or []
+
+    def save_page(self, row):
+        self.client.table("scraped_pages").upsert(row, on_conflict="unique_name,page_index").execute()
+
+    def save_pages(self, rows):
+        self._bulk_upsert("scraped_pages", rows, "unique_name,page_index")
+
+    def delete_pages(self, unique_name, start=0, end=None):
+        query = self.client.table("scraped_pages").delete().eq("unique_name", unique_name).gte("page_index", start)
+        if end is not None:
+            query = query.lt("page_index", end)
+        query.execute()
+
+    def last_page_index(self, unique_name):
+        response = (
+            self.client.table("scraped_pages").select("page_index")
+            .eq("unique_name", unique_name).order("page_index", desc=True).limit(1).execute()
+        )
+        return response.data[0]["page_index"] if response.data else None
+
+    def read_scraped_row(self, unique_name, columns):
+        response = self.client.table("scraped_data").select(*columns).eq("unique_name", unique_name).execute()
+        data = response.data
+        if data and len(data) > 0:
+            return data[0]
+        return {}
+
+    def save_scraped_row(self, row):
+        self.client.table("scraped_data").upsert(row, on_conflict="unique_name").execute()
+
+    def save_scraped_rows(self, rows):
+        self._bulk_upsert("scraped_data", rows, "unique_name")
+
+    def update_scraped_row(self, unique_name, values):
+        self.client.table("scraped_data").update(values).eq("unique_name", unique_name).execute()
+
+    def update_scraped_rows(self, rows):
+        # PostgREST has no bulk UPDATE; upsert on unique_name sets the same columns.
+        # The rows are written after the crawl created them, so nothing new is inserted.
+        self._bulk_upsert("scraped_data", rows, "unique_name")
+
+    def create_cron(self, data):
+        response = self.client.table("cron").insert(data).execute()
+        return response.data or []
+
+    def list_crons(self, columns):
+        response = self.client.table("cron").select(*columns).execute()
+        return response.data or []
+
+    def update_cron(self, cron_id, values):
+        self.client.table("cron").update(values).eq("id", cron_id).execute()
+
+    def read_checkpoint(self, job_id):
+        response = self.client.table("crawl_checkpoints").select("*").eq("job_id", job_id).execute()
+        return response.data[0] if response.data else {}
+
+    def save_checkpoint(self, row):
+        self.client.table("crawl_checkpoints").upsert(row, on_conflict="job_id").execute()
+
+    def delete_checkpoint(self, job_id):
+        self.client.table("crawl_checkpoints").delete().eq("job_id", job_id).execute()
+
+    def list_checkpoints(self, columns):
+        response = self.client.table("crawl_checkpoints").select(*columns).order("updated_at").execute()
+        return response.data or []
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    The same tables in a local SQLite file, for single-node batch crawls and offline runs.
+    The database runs in WAL mode so readers don't block the crawl's page writes.
+    JSON columns are stored as text and decoded on read.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS scraped_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        unique_name TEXT NOT NULL UNIQUE,
+        url TEXT,
+        raw_data TEXT,
+        raw_codec TEXT,
+        formatted_data TEXT,
+        pagination_data TEXT,
+        fetched_at TEXT,
+        validators TEXT,
+        page_count INTEGER,
+        page_base INTEGER,
+        created_at TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS scraped_pages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        unique_name TEXT NOT NULL,
+        page_index INTEGER NOT NULL,
+        url TEXT,
+        depth INTEGER,
+        status INTEGER,
+        html TEXT,
+        codec TEXT,
+        fetched_at TEXT,
+        UNIQUE (unique_name, page_index)
+    );
+
+    CREATE TABLE IF NOT EXISTS cron (
+        id TEXT PRIMARY KEY,
+        "cronCommand" TEXT,
+        depth_value INTEGER,
+        urls TEXT,
+        fields TEXT,
+        css_selector TEXT,
+        selection_type TEXT,
+        next_button_selector TEXT,
+        max_url INTEGER,
+        data TEXT,
+        created_at TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS crawl_checkpoints (
+        job_id TEXT PRIMARY KEY,
+        url TEXT,
+        params TEXT,
+        state TEXT,
+        updated_at TEXT
+    );
+    """
+
+    # Columns added after the first release, with their types: CREATE TABLE IF NOT EXISTS
+    # leaves an existing database alone, so they are added on open
+    ADDED_COLUMNS = {
+        "scraped_data": {"page_base": "INTEGER"},
+    }
+
+    JSON_COLUMNS = {
+        "scraped_data": {"formatted_data", "pagination_data", "validators"},
+        "scraped_pages": set(),
+        "cron": {"urls", "fields", "css_selector", "data"},
+        "crawl_checkpoints": {"params", "state"},
+    }
+
+    def __init__(self, path: str = SQLITE_DB_PATH):
+        self.path = path
+        # One connection shared by the crawl loop and its worker threads, serialized by a lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+            for table, columns in self.ADDED_COLUMNS.items():
+                existing = {row["name"] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+                for column, column_type in columns.items():
+                    if column not in existing:
+                        self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+            self._conn.commit()
+
+    def _encode(self, table: str, row: dict) -> dict:
+        json_columns = self.JSON_COLUMNS[table]
+        return {key: json.dumps(value) if key in json_columns and value is not None else value
+                for key, value in row.items()}
+
+    def _decode(self, table: str, row: sqlite3.Row) -> dict:
+        json_columns = self.JSON_COLUMNS[table]
+        return {key: json.loads(row[key]) if key in json_columns and row[key] is not None else row[key]
+                for key in row.keys()}
+
+    def _execute(self, sql: str, params: Sequence = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            rows = cursor.fetchall()
+            self._conn.commit()
+        return rows
+
+    def _execute_many(self, sql: str, params: List[Sequence]) -> None:
+        # One transaction for the whole batch; rolled back if any row fails
+        with self._lock:
+            try:
+                self._conn.executemany(sql, params)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    @staticmethod
+    def _columns(columns: Sequence[str]) -> str:
+        return ", ".join(f'"{column}"' for column in columns)
+
+    def _upsert_sql(self, table: str, columns: Sequence[str], conflict: Sequence[str]) -> str:
+        updates = ", ".join(f'"{c}" = excluded."{c}"' for c in columns if c not in conflict)
+        return (
+            f"INSERT INTO {table} ({self._columns(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT ({self._columns(conflict)}) DO "
+            + (f"UPDATE SET {updates}" if updates else "NOTHING")
+        )
+
+    def _upsert(self, table: str, row: dict, conflict: Sequence[str]) -> None:
+        row = self._encode(table, row)
+        columns = list(row)
+        self._execute(self._upsert_sql(table, columns, conflict), [row[c] for c in columns])
+
+    def _upsert_many(self, table: str, rows: List[dict], conflict: Sequence[str]) -> None:
+        for group in _group_by_columns(rows):
+            columns = list(group[0])
+            encoded = [self._encode(table, row) for row in group]
+            self._execute_many(self._upsert_sql(table, columns, conflict), [[row[c] for c in columns] for row in encoded])
+
+    def _update(self, table: str, key: str, key_value, values: dict) -> None:
+        values = self._encode(table, values)
+        assignments = ", ".join(f'"{c}" = ?' for c in values)
+        self._execute(f'UPDATE {table} SET {assignments} WHERE "{key}" = ?', [*values.values(), key_value])
+
+    def read_pages(self, unique_name, start, limit, index_range=None):
+        first, end = index_range if index_range is not None else (0, None)
+        rows = self._execute(
+            "SELECT page_index, url, depth, status, html, codec, fetched_at FROM scraped_pages "
+            "WHERE unique_name = ? AND page_index >= ? AND (? IS NULL OR page_index < ?) "
+            "ORDER BY page_index LIMIT ? OFFSET ?",
+            (unique_name, first, end, end, limit, start),
+        )
+        return [self._decode("scraped_pages", row) for row in rows]
+
+    def save_page(self, row):
+        self._upsert("scraped_pages", row, ("unique_name", "page_index"))
+
+    def save_pages(self, rows):
+        self._upsert_many("scraped_pages", rows, ("unique_name", "page_index"))
+
+    def delete_pages(self, unique_name, start=0, end=None):
+        if end is None:
+            self._execute("DELETE FROM scraped_pages WHERE unique_name = ? AND page_index >= ?", (unique_name, start))
+        else:
+            self._execute(
+                "DELETE FROM scraped_pages WHERE unique_name = ? AND page_index >= ? AND page_index < ?",
+                (unique_name, start, end),
+            )
+
+    def last_page_index(self, unique_name):
+        rows = self._execute("SELECT MAX(page_index) FROM scraped_pages WHERE unique_name = ?", (unique_name,))
+        return rows[0][0]
+
+    def read_scraped_row(self, unique_name, columns):
+        rows = self._execute(
+            f"SELECT {self._columns(columns)} FROM scraped_data WHERE unique_name = ?", (unique_name,)
+        )
+        return self._decode("scraped_data", rows[0]) if rows else {}
+
+    def save_scraped_row(self, row):
+        if "created_at" not in row:
+            # Like the Postgres default; set on insert only, the upsert leaves it alone
+            self._execute(
+                "INSERT OR IGNORE INTO scraped_data (unique_name, created_at) VALUES (?, ?)",
+                (row["unique_name"], datetime.now(timezone.utc).isoformat()),
+            )
+        self._upsert("scraped_data", row, ("unique_name",))
+
+    def save_scraped_rows(self, rows):
+        now = datetime.now(timezone.utc).isoformat()
+        self._execute_many(
+            "INSERT OR IGNORE INTO scraped_data (unique_name, created_at) VALUES (?, ?)",
+            [(row["unique_name"], now) for row in rows if "created_at" not in row],
+        )
+        self._upsert_many("scraped_data", rows, ("unique_name",))
+
+    def update_scraped_row(self, unique_name, values):
+        self._update("scraped_data", "unique_name", unique_name, values)
+
+    def update_scraped_rows(self, rows):
+        for group in _group_by_columns(rows):
+            columns = [c for c in group[0] if c != "unique_name"]
+            assignments = ", ".join(f'"{c}" = ?' for c in columns)
+            encoded = [self._encode("scraped_data", row) for row in group]
+            self._execute_many(
+                f"UPDATE scraped_data SET {assignments} WHERE unique_name = ?",
+                [[row[c] for c in columns] + [row["unique_name"]] for row in encoded],
+            )
+
+    def create_cron(self, data):
+        row = {"id": str(uuid.uuid4()), **data, "created_at": datetime.now(timezone.utc).isoformat()}
+        encoded = self._encode("cron", row)
+        self._execute(
+            f"INSERT INTO cron ({self._columns(encoded)}) VALUES ({', '.join('?' for _ in encoded)})",
+            list(encoded.values()),
+        )
+        return [row]
+
+    def list_crons(self, columns):
+        rows = self._execute(f"SELECT {self._columns(columns)} FROM cron ORDER BY created_at")
+        return [self._decode("cron", row) for row in rows]
+
+    def update_cron(self, cron_id, values):
+        self._update("cron", "id", cron_id, values)
+
+    def read_checkpoint(self, job_id):
+        rows = self._execute("SELECT * FROM crawl_checkpoints WHERE job_id = ?", (job_id,))
+        return self._decode("crawl_checkpoints", rows[0]) if rows else {}
+
+    def save_checkpoint(self, row):
+        self._upsert("crawl_checkpoints", row, ("job_id",))
+
+    def delete_checkpoint(self, job_id):
+        self._execute("DELETE FROM crawl_checkpoints WHERE job_id = ?", (job_id,))
+
+    def list_checkpoints(self, columns):
+        rows = self._execute(f"SELECT {self._columns(columns)} FROM crawl_checkpoints ORDER BY updated_at")
+        return [self._decode("crawl_checkpoints", row) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# The SQLite backend, opened once for the process
+_storage: Optional[SQLiteStorage] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> Optional[StorageBackend]:
+    """
+    Returns the storage backend, chosen by the STORAGE_BACKEND env var (or
+    assets.STORAGE_BACKEND): "supabase" or "sqlite". SQLite is one backend for the
+    process; Supabase uses the credentials of the current context (see
+    api_management.use_supabase_credentials) and, like get_supabase_client(),
+    returns None while they are missing.
+    """
+    global _storage
+    backend = (os.getenv("STORAGE_BACKEND") or STORAGE_BACKEND).lower()
+    if backend == "supabase":
+        credentials = current_supabase_credentials()
+        return SupabaseStorage(credentials) if credentials is not None else None
+    if backend != "sqlite":
+        raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}, expected 'supabase' or 'sqlite'")
+    with _storage_lock:
+        if _storage is None:
+            _storage = SQLiteStorage(os.getenv("SQLITE_DB_PATH") or SQLITE_DB_PATH)
+        return _storage
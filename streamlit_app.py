@@ -2,23 +2,22 @@
 
 import streamlit as st
 from streamlit_tags import st_tags_sidebar
-import pandas as pd
 import json
+import queue
 import re
 import time
 import json
 import sys
 import asyncio
-from crontab import CronTab
 # ---local imports---
-from scraper import scrape_urls,scrape_urls_manually
-from pagination import paginate_urls
-from markdown import fetch_and_store_markdowns
+from pipeline import pipeline_job
+from browser_pool import submit
+from utils import generate_cache_key
 from assets import MODELS_USED
+from api_management import get_supabase_credentials, use_supabase_credentials
 from cron import createCron,run_crons
-from api_management import get_supabase_client
+from storage import get_storage
 from cron import get_cron_data
-cron = CronTab(user=True)
 
 cron_syntax= ""
 # Only use WindowsProactorEventLoopPolicy on Windows
@@ -36,26 +35,47 @@ hide_streamlit_style = """
     </style>
 """
 st.markdown(hide_streamlit_style, unsafe_allow_html=True)
-supabase=get_supabase_client()
-if supabase==None:
+# This session's Supabase credentials (sidebar, else env) for everything this script run
+# reads or writes, including the jobs it submits to the crawl loop
+use_supabase_credentials(get_supabase_credentials())
+storage=get_storage()
+if storage==None:
     st.error("🚨 **Supabase is not configured!** This project requires a Supabase database to function.")
     st.warning("Follow these steps to set it up:")
 
     st.markdown("""
     1. **[Create a free Supabase account](https://supabase.com/)**.
     2. **Create a new project** inside Supabase.
-    3. **Create a table** in your project by running the following SQL command in the **SQL Editor**:
+    3. **Create the tables** in your project by running the following SQL command in the **SQL Editor**:
     
     ```sql
     CREATE TABLE IF NOT EXISTS scraped_data (
     id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
-    unique_name TEXT NOT NULL,
+    unique_name TEXT NOT NULL UNIQUE,
     url TEXT,
     raw_data JSONB,        
     formatted_data JSONB, 
     pagination_data JSONB,
+    fetched_at TIMESTAMPTZ,
+    validators JSONB,
+    page_count INT,
+    page_base INT,
+    raw_codec TEXT,
     created_at TIMESTAMPTZ DEFAULT NOW()
     );
+
+    CREATE TABLE IF NOT EXISTS scraped_pages (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    unique_name TEXT NOT NULL,
+    page_index INT NOT NULL,
+    url TEXT,
+    depth INT,
+    status INT,
+    html TEXT,
+    codec TEXT,
+    fetched_at TIMESTAMPTZ DEFAULT NOW(),
+    UNIQUE (unique_name, page_index)
+    );
     ```
 
     4. **Go to Project Settings → API** and copy:
@@ -70,6 +90,8 @@ if supabase==None:
     ```
 
     6. **Restart the project** close everything and reopen it, and you’re good to go! 🚀
+
+    To run without Supabase, set `STORAGE_BACKEND=sqlite` in your `.env` instead; everything is then stored in a local SQLite file (`SQLITE_DB_PATH`, default `scraper.db`).
     """)
 
 st.title("Web Scraper ")
@@ -95,8 +117,8 @@ with st.sidebar.expander("API Keys", expanded=False):
             # Create a password-type text input for each API key
             # st.session_state[key_name] = 
             st.text_input(key_name,type="password",key=key_name)
-    st.session_state['SUPABASE_URL'] = st.text_input("SUPABASE URL")
-    st.session_state['SUPABASE_ANON_KEY'] = st.text_input("SUPABASE ANON KEY", type="password")
+    st.text_input("SUPABASE URL", key='SUPABASE_URL')
+    st.text_input("SUPABASE ANON KEY", type="password", key='SUPABASE_ANON_KEY')
 
 # Model selection
 model_selection = st.sidebar.selectbox("Select Model", options=list(MODELS_USED.keys()), index=0)
@@ -190,6 +212,9 @@ if show_depth_pagination:
         help="Provide the unique ID or class selector for the 'Next' or 'Load More' button. The scraper will automatically click this button to load more data.",
         key="next_button_selector"
     )
+force_refresh = st.sidebar.checkbox("Force re-crawl", help="Ignore stored pages that are still fresh and crawl every URL again.")
+lean_rendering = st.sidebar.checkbox("Lean rendering", help="Block images, video, fonts and analytics scripts while rendering pages. Faster and lighter; contact details are unaffected.")
+follow_pagination = st.sidebar.checkbox("Follow pagination", help="Find each URL's page links (?page=2, /page/2, ...) and scrape those pages too. Their results are merged into the URL's.")
 st.sidebar.markdown("---")
 
 # Fields to extract
@@ -249,14 +274,20 @@ if show_tags:
                 st.session_state['model_selection'] = model_selection
                 st.session_state['scrap-type']="manual"
                 st.session_state['css-selectors']= css_selectors
-                st.session_state['use_pagination'] = False
+                st.session_state['use_pagination'] = follow_pagination
                 st.session_state['pagination_details'] = False
                 # st.session_state['pagination_depth'] = depth_value  # Save the depth value
                 # st.session_state['next_button_selector'] = next_button_selector  # Save the next button selector
                 
-                # fetch or reuse the markdown for each URL
-                unique_names = fetch_and_store_markdowns(st.session_state["urls_splitted"],depth_value,max_url,next_button_selector)
-                st.session_state["unique_names"] = unique_names
+                # Crawl settings for the pipeline, which fetches and extracts in one go
+                st.session_state['crawl_settings'] = {
+                    "depth": depth_value,
+                    "max_url": max_url,
+                    "nextButton": next_button_selector,
+                    "force_refresh": force_refresh,
+                    "profile": "lean" if lean_rendering else "full",
+                    "follow_pagination": follow_pagination,
+                }
 
                 # Move on to "scraping" step
                 st.session_state['scraping_state'] = 'scraping'
@@ -281,14 +312,20 @@ if show_tags:
                 st.session_state['model_selection'] = model_selection
                 st.session_state['scrap-type']="ai"
                 st.session_state['css-selectors']= css_selectors
-                st.session_state['use_pagination'] =  False
+                st.session_state['use_pagination'] =  follow_pagination
                 st.session_state['pagination_details'] = False
                 # st.session_state['pagination_depth'] = depth_value  # Save the depth value
                 # st.session_state['next_button_selector'] = next_button_selector  # Save the next button selector
                 
-                # fetch or reuse the markdown for each URL
-                unique_names = fetch_and_store_markdowns(st.session_state["urls_splitted"],depth_value,max_url,next_button_selector)
-                st.session_state["unique_names"] = unique_names
+                # Crawl settings for the pipeline, which fetches and extracts in one go
+                st.session_state['crawl_settings'] = {
+                    "depth": depth_value,
+                    "max_url": max_url,
+                    "nextButton": next_button_selector,
+                    "force_refresh": force_refresh,
+                    "profile": "lean" if lean_rendering else "full",
+                    "follow_pagination": follow_pagination,
+                }
 
                 # Move on to "scraping" step
                 st.session_state['scraping_state'] = 'scraping'
@@ -373,6 +410,16 @@ if scheduling:
             # st.session_state['pagination_depth'] = depth_value  # Save the depth value
             # st.session_state['next_button_selector'] = next_button_selector  # Save the next button selector
             
+            # Crawl settings for the first run, done right away by the pipeline
+            st.session_state['crawl_settings'] = {
+                "depth": depth_value,
+                "max_url": max_url,
+                "nextButton": next_button_selector,
+                "force_refresh": force_refresh,
+                "profile": "lean" if lean_rendering else "full",
+                "follow_pagination": follow_pagination,
+            }
+
             # fetch or reuse the markdown for each URL
             createCron(st.session_state['urls'],cron_syntax,fields,st.session_state['scrap-type'],css_selectors)
             # run_crons
@@ -467,53 +514,141 @@ def show_cron_data():
                 # When clicked, show the associated data in the sidebar
                 showCronData(all_data[index]['data'])
 
+def listing_rows(data_item):
+    """Table rows of one result entry: one per listing, or the entry itself."""
+    parsed_obj = data_item.get("parsed_data")
+    if hasattr(parsed_obj, "model_dump"):
+        parsed_obj = parsed_obj.model_dump()
+    elif isinstance(parsed_obj, str):
+        try:
+            parsed_obj = json.loads(parsed_obj)
+        except json.JSONDecodeError:
+            pass
+    if isinstance(parsed_obj, dict) and isinstance(parsed_obj.get("listings"), list):
+        return [dict(listing) for listing in parsed_obj["listings"]]
+    return [dict(data_item)] if parsed_obj else []
+
+
+def start_pipeline_job(crawl, ai):
+    """
+    Start the pipeline on the crawl loop without waiting for it. Each finished URL is
+    pushed onto the job's queue; the job is kept in session_state, so a rerun (e.g. a
+    click on an early download) picks the same job up again instead of losing it.
+    """
+    events = queue.Queue()
+    urls = st.session_state["urls_splitted"]
+    future = submit(pipeline_job(
+        urls,
+        st.session_state['fields'],
+        crawl["depth"],
+        crawl["max_url"],
+        crawl["nextButton"],
+        scrap_type="ai" if ai else "manual",
+        selected_model=st.session_state['model_selection'],
+        css_selectors=st.session_state['css-selectors'],
+        force_refresh=crawl["force_refresh"],
+        profile=crawl["profile"],
+        paginate=st.session_state['use_pagination'],
+        indication=st.session_state['pagination_details'] or "",
+        on_result=events.put,
+        follow_pagination=crawl.get("follow_pagination", False),
+    ))
+    total = len({generate_cache_key(url, crawl["depth"], crawl["max_url"], crawl["nextButton"]) for url in urls})
+    return {"settings": crawl, "future": future, "events": events, "total": total, "finished": 0, "failed": 0, "followed": 0,
+            "pages": 0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0, "data": [], "rows": [], "renders": 0}
+
+
+def drain_pipeline_job(job):
+    """Move the job's finished URLs into its running totals. Returns True if there were any."""
+    changed = False
+    while True:
+        try:
+            record = job["events"].get_nowait()
+        except queue.Empty:
+            return changed
+        changed = True
+        # Followed pagination pages are extra work for a URL, not URLs of their own
+        job["followed" if record["parent"] else "finished"] += 1
+        if record["error"]:
+            job["failed"] += 1
+        job["pages"] += record["pages"]
+        # The live counters show extraction and pagination detection together
+        job["input_tokens"] += record["input_tokens"] + record["pagination_input_tokens"]
+        job["output_tokens"] += record["output_tokens"] + record["pagination_output_tokens"]
+        job["cost"] += record["cost"] + record["pagination_cost"]
+        job["data"].extend(record["data"])
+        for data_item in record["data"]:
+            job["rows"].extend(listing_rows(data_item))
+
+
+def render_pipeline_job(job, live):
+    """Redraw the live counters, the rows so far and partial downloads in the `live` placeholder."""
+    import pandas as pd
+
+    job["renders"] += 1
+    with live.container():
+        failed = f" · {job['failed']} failed" if job["failed"] else ""
+        followed = f" (+{job['followed']} pagination pages)" if job["followed"] else ""
+        st.progress(
+            job["finished"] / max(job["total"], 1),
+            text=f"{job['finished']}/{job['total']} URLs{followed} · {job['pages']} pages · "
+                 f"{job['input_tokens'] + job['output_tokens']} tokens · ${job['cost']:.4f}{failed}",
+        )
+        if job["rows"]:
+            partial_df = pd.DataFrame(job["rows"])
+            st.dataframe(partial_df, use_container_width=True)
+            col1, col2 = st.columns(2)
+            with col1:
+                json_data = json.dumps(job["data"], default=lambda o: o.dict() if hasattr(o, 'dict') else str(o), indent=4)
+                st.download_button("Download JSON so far", data=json_data, file_name="scraped_data_partial.json", key=f"partial_json_{job['renders']}")
+            with col2:
+                st.download_button("Download CSV so far", data=partial_df.to_csv(index=False), file_name="scraped_data_partial.csv", key=f"partial_csv_{job['renders']}")
+
+
 show_cron_data()
 if st.session_state['scraping_state'] == 'scraping':
     try:
         with st.spinner("Processing..."):
-            unique_names = st.session_state["unique_names"]  # from the LAUNCH step
-            total_input_tokens = 0
-            total_output_tokens = 0
-            total_cost = 0
-            
-            # 1) Scraping logic
-            all_data = []
+            crawl = st.session_state['crawl_settings']  # from the LAUNCH step
+            ai = show_tags and st.session_state['scrap-type']=='ai'
             print("scrapethpe",st.session_state['scrap-type'])
             print("showtags",show_tags)
-            if show_tags and st.session_state['scrap-type']=='ai':
-                in_tokens_s, out_tokens_s, cost_s, parsed_data = scrape_urls(unique_names,st.session_state['fields'],st.session_state['model_selection'])
-                total_input_tokens += in_tokens_s
-                total_output_tokens += out_tokens_s
-                total_cost += cost_s
-
-                # Store or display parsed data 
-                all_data = parsed_data # or rename to something consistent
-                st.session_state['in_tokens_s'] = in_tokens_s
-                st.session_state['out_tokens_s'] = out_tokens_s
-                st.session_state['cost_s'] = cost_s
-            # 2) Pagination logic
-            else:
-                print("Unique Names",unique_names)
-                all_data= scrape_urls_manually(unique_names,st.session_state['fields'],st.session_state['css-selectors'])
-                print(all_data)
-                st.session_state['in_tokens_s'] = 0
-                st.session_state['out_tokens_s'] = 0
-                st.session_state['cost_s'] = 0
+
+            # Fetch, extraction, pagination detection and storage run as one pipeline:
+            # each URL is extracted as soon as its crawl is stored and shown right away
+            job = st.session_state.get('pipeline_job')
+            if job is None or job["settings"] is not crawl:
+                job = st.session_state['pipeline_job'] = start_pipeline_job(crawl, ai)
+            live = st.empty()
+            render_pipeline_job(job, live)
+            while True:
+                done = job["future"].done()
+                if drain_pipeline_job(job):
+                    render_pipeline_job(job, live)
+                if done:
+                    break
+                time.sleep(0.5)
+            live.empty()
+            st.session_state['pipeline_job'] = None
+            unique_names, in_tokens_s, out_tokens_s, cost_s, all_data, page_results, pagination_usage = job["future"].result()
+            st.session_state["unique_names"] = unique_names
+            st.session_state['in_tokens_s'] = in_tokens_s
+            st.session_state['out_tokens_s'] = out_tokens_s
+            st.session_state['cost_s'] = cost_s
+            total_input_tokens, total_output_tokens, total_cost = in_tokens_s, out_tokens_s, cost_s
 
             pagination_info = None
             if st.session_state['use_pagination']:
-                in_tokens_p, out_tokens_p, cost_p, page_results = paginate_urls(unique_names, st.session_state['model_selection'],st.session_state['pagination_details'] or False,st.session_state["urls_splitted"])
+                # pagination_info holds the detected 'page_urls' of each crawl
+                pagination_info = page_results
+                in_tokens_p, out_tokens_p, cost_p = pagination_usage
                 total_input_tokens += in_tokens_p
                 total_output_tokens += out_tokens_p
                 total_cost += cost_p
-
-                # Example: store or display page_results
-                # pagination_info can contain the final 'page_urls' from the LLM
-                pagination_info = page_results
-                # you'd parse the page_results to build 'page_urls'
                 st.session_state['in_tokens_p'] = in_tokens_p
                 st.session_state['out_tokens_p'] = out_tokens_p
                 st.session_state['cost_p'] = cost_p
+
             # 3) Save everything in session state
             # print(all_data)
             st.session_state['results'] = {
@@ -530,6 +665,7 @@ if st.session_state['scraping_state'] == 'scraping':
 
         # Reset the scraping state to 'idle' so that the app stays in an idle state.
         st.session_state['scraping_state'] = 'idle'
+        st.session_state['pipeline_job'] = None
 
 # Display results
 if st.session_state['scraping_state'] == 'completed' and st.session_state['results']:
@@ -611,6 +747,7 @@ if st.session_state['scraping_state'] == 'completed' and st.session_state['resul
         if not all_rows:
             st.warning("No data rows to display.")
         else:
+            import pandas as pd  # loaded once there are results to show, not on every app start
             df = pd.DataFrame(all_rows)
             st.dataframe(df, use_container_width=True)
 
@@ -644,6 +781,7 @@ if st.session_state['scraping_state'] == 'completed' and st.session_state['resul
                 else:
                     all_listings.append(data)
             
+            import pandas as pd
             combined_df = pd.DataFrame(all_listings)
             st.download_button("Download CSV",data=combined_df.to_csv(index=False),file_name="scraped_data.csv")
 
@@ -698,6 +836,7 @@ if st.session_state['scraping_state'] == 'completed' and st.session_state['resul
         if not all_page_rows:
             st.warning("No page URLs found.")
         else:
+            import pandas as pd
             pagination_df = pd.DataFrame(all_page_rows)
             st.markdown("---")
             st.subheader("Pagination Information")
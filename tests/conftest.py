@@ -0,0 +1,21 @@
+# conftest.py
+
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def sqlite_storage(tmp_path, monkeypatch):
+    """A fresh SQLiteStorage, used by every get_storage() call of the test."""
+    import storage
+
+    backend = storage.SQLiteStorage(str(tmp_path / "scraper.db"))
+    monkeypatch.setenv("STORAGE_BACKEND", "sqlite")
+    monkeypatch.setattr(storage, "_storage", backend)
+    yield backend
+    backend.close()
@@ -0,0 +1,35 @@
+# test_pagination_detector.py
+
+from assets import PAGINATION_MAX_PAGES
+from pagination_detector import detect_pagination
+
+LISTING = "https://shop.example.com/products"
+
+
+def page(number):
+    return f"{LISTING}?page={number}"
+
+
+def test_pages_from_the_first_to_the_last_linked():
+    result = detect_pagination(LISTING, [page(2), page(3), page(5)])
+    assert result["method"] == "page"
+    assert result["page_urls"] == [LISTING, page(2), page(3), page(4), page(5)]
+
+
+def test_current_page_above_the_cap_keeps_its_neighbours():
+    current = PAGINATION_MAX_PAGES * 2 + 50
+    last = PAGINATION_MAX_PAGES * 5
+    result = detect_pagination(page(current), [page(1), page(current - 1), page(current + 1), page(last)])
+
+    urls = result["page_urls"]
+    assert len(urls) == PAGINATION_MAX_PAGES
+    assert page(current - 1) in urls and page(current) in urls and page(current + 1) in urls
+    first = current - PAGINATION_MAX_PAGES // 2
+    assert urls == [page(number) for number in range(first, first + PAGINATION_MAX_PAGES)]
+
+
+def test_window_stops_at_the_last_linked_page():
+    last = PAGINATION_MAX_PAGES * 3
+    result = detect_pagination(page(last - 1), [page(1), page(last - 2), page(last)])
+    assert result["page_urls"][-1] == page(last)
+    assert len(result["page_urls"]) == PAGINATION_MAX_PAGES
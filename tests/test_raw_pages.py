@@ -0,0 +1,61 @@
+# test_raw_pages.py
+
+import asyncio
+
+import pytest
+
+import markdown
+
+URL = "https://example.com/"
+
+
+def fake_crawl(generation, fail_after=None):
+    """A crawl_pages_async stand-in storing three pages, or raising after fail_after pages."""
+    async def crawl_pages_async(url, depth, max_url, nextButton, visited_urls=None, pool=None,
+                                profile=None, on_page=None, pending=None, on_checkpoint=None):
+        pages = []
+        for i in range(3):
+            if fail_after is not None and i == fail_after:
+                raise RuntimeError("crawl interrupted")
+            page = {"url": f"{url}p{i}", "depth": 1, "status": 200, "static": True, "headers": {},
+                    "html": f"<p>{generation} page {i}</p>"}
+            await on_page(page)
+            pages.append(page)
+        return pages
+    return crawl_pages_async
+
+
+def crawl(monkeypatch, generation, fail_after=None, force_refresh=False):
+    monkeypatch.setattr(markdown, "crawl_pages_async", fake_crawl(generation, fail_after))
+    monkeypatch.setattr(markdown, "_url_semaphore", None)
+    return asyncio.run(markdown.fetch_and_store_one_async(URL, 1, 10, None, force_refresh))
+
+
+def test_interrupted_recrawl_keeps_reading_the_finished_crawl(sqlite_storage, monkeypatch):
+    unique_name, changed = crawl(monkeypatch, "first")
+    assert changed
+
+    with pytest.raises(RuntimeError):
+        crawl(monkeypatch, "second", fail_after=1, force_refresh=True)
+    # The interrupted re-crawl stored its first page after the finished crawl's pages
+    assert sqlite_storage.last_page_index(unique_name) == 3
+
+    # The stored crawl is still fresh, so the next run reuses it
+    _, changed = crawl(monkeypatch, "third")
+    assert not changed
+    assert markdown.read_raw_data(unique_name) == "".join(f"<p>first page {i}</p>" for i in range(3))
+
+
+def test_finished_recrawl_replaces_the_previous_pages(sqlite_storage, monkeypatch):
+    crawl(monkeypatch, "first")
+    with pytest.raises(RuntimeError):
+        crawl(monkeypatch, "second", fail_after=2, force_refresh=True)
+
+    monkeypatch.setattr(markdown, "crawl_pages_async", fake_crawl("third"))
+    monkeypatch.setattr(markdown, "_url_semaphore", None)
+    (unique_name,) = asyncio.run(markdown.fetch_and_store_markdowns_async([URL], 1, 10, None, force_refresh=True))
+
+    pages = list(markdown.iter_raw_pages(unique_name))
+    assert [page["html"] for page in pages] == [f"<p>third page {i}</p>" for i in range(3)]
+    # Only the new crawl's pages are left in storage
+    assert len(sqlite_storage.read_pages(unique_name, 0, 100)) == 3
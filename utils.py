@@ -1,4 +1,7 @@
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import hashlib
 import re
 # =============================================================================
 # 6) GENERATE UNIQUE FOLDER NAME
@@ -11,6 +14,54 @@ def generate_unique_name(url: str) -> str:
     domain = re.sub(r'\W+', '_', url.split('//')[-1].split('/')[0])
     return f"{domain}_{timestamp}"
 
+# =============================================================================
+# 7) DETERMINISTIC CACHE KEYS
+# =============================================================================
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL so trivially different spellings share one cache entry:
+    lowercase scheme/host, drop default ports, fragments and trailing slashes,
+    and sort query parameters.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def generate_cache_key(url: str, depth=0, max_url=1, nextButton: Optional[str] = None) -> str:
+    """
+    Generate a stable unique_name for a crawl: the same normalized URL and crawl
+    parameters always map to the same row, so stored pages can be reused.
+    """
+    domain = re.sub(r'\W+', '_', url.split('//')[-1].split('/')[0])
+    fingerprint = f"{normalize_url(url)}|depth={depth}|max_url={max_url}|next={nextButton or ''}"
+    digest = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+    return f"{domain}_{digest}"
+
+
+def is_fresh(timestamp: Optional[str], ttl_seconds: float) -> bool:
+    """
+    True if an ISO timestamp from the database is younger than ttl_seconds.
+    """
+    if not timestamp:
+        return False
+    try:
+        stored = datetime.fromisoformat(str(timestamp).replace("Z", "+00:00"))
+    except ValueError:
+        return False
+    if stored.tzinfo is None:
+        stored = stored.replace(tzinfo=timezone.utc)
+    age = (datetime.now(timezone.utc) - stored).total_seconds()
+    return age < ttl_seconds
+
 # def calculate_price(token_counts, model):
 #     """
 #     Calculate the cost based on input/output tokens and model pricing.
@@ -0,0 +1,105 @@
+# write_buffer.py
+
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from assets import WRITE_BUFFER_MAX_ROWS, WRITE_BUFFER_MAX_DELAY
+
+
+class WriteBuffer:
+    """
+    Collects rows and writes them with one bulk call instead of one round trip per row.
+
+    - write_many: bulk writer (e.g. storage.save_pages), called with a list of rows
+    - write_one: single-row writer, used to retry each row when a bulk write fails so
+      one bad row doesn't lose the whole batch
+    - max_rows: flush as soon as this many rows are pending
+    - max_delay: flush rows that have been pending this many seconds, even if no more arrive
+
+    Use close() (or a with block) at the end of a job to write what is left; it
+    returns every (row, error) that could not be written.
+    """
+
+    def __init__(
+        self,
+        write_many: Callable[[List[dict]], None],
+        write_one: Callable[[dict], None],
+        name: str = "rows",
+        max_rows: int = WRITE_BUFFER_MAX_ROWS,
+        max_delay: float = WRITE_BUFFER_MAX_DELAY,
+    ):
+        self.write_many = write_many
+        self.write_one = write_one
+        self.name = name
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.written = 0
+        self.failures: List[Tuple[dict, Exception]] = []
+        self._pending: List[dict] = []
+        self._first_pending_at: Optional[float] = None
+        self._lock = threading.Lock()
+        # Writes are serialized so rows land in the order they were added
+        self._write_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def add(self, row: dict) -> None:
+        with self._lock:
+            self._pending.append(row)
+            if self._first_pending_at is None:
+                self._first_pending_at = time.monotonic()
+                self._start_timer()
+            due = (
+                len(self._pending) >= self.max_rows
+                or time.monotonic() - self._first_pending_at >= self.max_delay
+            )
+        if due:
+            self.flush()
+
+    def _start_timer(self) -> None:
+        if self.max_delay <= 0:
+            return
+        self._timer = threading.Timer(self.max_delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self) -> List[Tuple[dict, Exception]]:
+        """Write pending rows now. Returns the rows that failed in this flush with their errors."""
+        with self._write_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+                self._first_pending_at = None
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not rows:
+                return []
+
+            try:
+                self.write_many(rows)
+                self.written += len(rows)
+                return []
+            except Exception as e:
+                print(f"Bulk write of {len(rows)} {self.name} failed ({e}), retrying row by row")
+
+            failed = []
+            for row in rows:
+                try:
+                    self.write_one(row)
+                    self.written += 1
+                except Exception as e:
+                    print(f"Failed to write {self.name} row {row.get('unique_name')}/{row.get('page_index', '-')}: {e}")
+                    failed.append((row, e))
+            self.failures.extend(failed)
+            return failed
+
+    def close(self) -> List[Tuple[dict, Exception]]:
+        """Final flush. Returns every row that failed over the buffer's lifetime."""
+        self.flush()
+        return list(self.failures)
+
+    def __enter__(self) -> "WriteBuffer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()